@@ -1,13 +1,11 @@
 import os
-import datetime
-import pandas as pd
-import openpyxl
 from openpyxl import Workbook
-import shutil
-import requests
-import urllib.request
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rpa_utils import backup_store, naver_api, naver_parser, workbook_backend
+
 def get_naver_shopping_data():
     """
     네이버 쇼핑 API를 호출하여 쇼핑 목록 데이터를 가져옵니다.
@@ -22,22 +20,15 @@ def get_naver_shopping_data():
     if not client_id or not client_secret:
         raise ValueError("NAVER_CLIENT_ID 또는 NAVER_CLIENT_SECRET 환경 변수가 설정되지 않았습니다.")
 
-    encText = urllib.parse.quote("쇼핑")
-    url = f"https://openapi.naver.com/v1/search/shop?display=20&sort=date&query={encText}"
-    request = urllib.request.Request(url)
-    request.add_header("X-Naver-Client-Id", client_id)
-    request.add_header("X-Naver-Client-Secret", client_secret)
-
-    response = urllib.request.urlopen(request)
-    rescode = response.getcode()
+    # 공유 keep-alive 세션으로 호출 (연결 재사용)
+    response_body = naver_api.fetch_naver_api_data("shop", "쇼핑", sort="date", display=20)
 
-    if rescode == 200:
-        response_body = response.read().decode('utf-8')  # Decode bytes to string
-        # JSON 데이터를 Pandas DataFrame으로 변환
-        shopping_data = pd.read_json(response_body)
+    if response_body is not None:
+        # JSON 응답의 items를 Pandas DataFrame으로 변환 (상품 필드별 열)
+        shopping_data = naver_parser.page_to_dataframe(response_body)
         return shopping_data
     else:
-        raise Exception(f"네이버 쇼핑 API 호출 실패. Error Code: {rescode}")
+        raise Exception("네이버 쇼핑 API 호출 실패.")
 
 def main():
     # 현재 작업 폴더 경로
@@ -55,46 +46,27 @@ def main():
         wb.save(excel_file)
         print(f"파일 생성: {excel_file}")
     
-    # 2. genai_rpa_yyyymmddHHMMSS.xlsx 백업
-    now = datetime.datetime.now()
-    timestamp = now.strftime("%Y%m%d%H%M%S")
-    backup_file = os.path.join(current_folder, f"genai_rpa_{timestamp}.xlsx")
-    
+    # 2. genai_rpa_yyyymmddHHMMSS 백업 (변경된 부분만 압축 저장, 백그라운드 실행)
+    backups = backup_store.BackupStore(os.path.join(current_folder, "backups"))
     if os.path.exists(excel_file):
-        shutil.copy2(excel_file, backup_file)
-        print(f"백업 파일 생성: {backup_file}")
-    
-    # 3, 4, 5. 시트 관리 (시트 제거, 이름 변경, 생성)
-    wb = openpyxl.load_workbook(excel_file)
-    
-    # 3. prev_list 시트가 있으면 제거
-    if "prev_list" in wb.sheetnames:
-        del wb["prev_list"]
-        print("prev_list 시트 제거 완료")
-    
-    # 4. now_list 시트를 prev_list로 변경
-    if "now_list" in wb.sheetnames:
-        now_list_sheet = wb["now_list"]
-        now_list_sheet.title = "prev_list"
-        print("now_list 시트를 prev_list로 변경 완료")
-    
-    # 5. now_list 시트 생성
-    wb.create_sheet("now_list")
-    print("now_list 시트 생성 완료")
-    
-    # 일단 변경사항 저장
-    wb.save(excel_file)
+        backups.backup_async(excel_file)
     
     # 6. naver api function 호출 : 쇼핑목록 데이터 가져오기
+    # (실패하면 아래 세션을 열기 전에 중단되므로 파일은 그대로 유지)
     shopping_data = get_naver_shopping_data()
     print("네이버 쇼핑 데이터 가져오기 완료")
     
-    # 7. now_list sheet 내용 update
-    with pd.ExcelWriter(excel_file, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        shopping_data.to_excel(writer, sheet_name="now_list", index=False)
-    print("now_list 시트 데이터 업데이트 완료")
+    # 3~7. 파일을 한 번만 읽고, 시트 회전과 데이터 교체를 메모리에서 처리한 뒤
+    #      임시 파일에 저장 후 이름 변경(atomic rename)으로 한 번에 반영
+    with workbook_backend.workbook_session(excel_file) as book:
+        # 3, 4, 5. prev_list 제거, now_list -> prev_list 이름 변경, now_list 생성
+        book.rotate_sheets()
+        
+        # 7. now_list sheet 내용 update
+        book.write_frame("now_list", shopping_data, header=True)
+        print("now_list 시트 데이터 업데이트 완료")
     
-    # 8. genai_rpa.xlsx 파일 저장 (이미 위에서 저장되었음)
+    # 8. genai_rpa.xlsx 파일 저장 (세션 종료 시 한 번 저장됨)
     print(f"작업이 완료되었습니다. 파일 경로: {excel_file}")
 
 if __name__ == "__main__":
@@ -11,6 +11,9 @@ from openai import OpenAI
 import os
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rpa_utils import excel_io, file_lock, llm_metrics, openai_api
+
 # .env 파일 로드
 load_dotenv()
 
@@ -110,23 +113,19 @@ def handle_list_sheet(wb):
 
 def update_now_list(wb, df_shopping):
     # 8. 'now_list' 시트 내용 업데이트
-    now_sheet = wb['now_list']
-    for row in now_sheet.iter_rows():
-        for cell in row:
-            cell.value = None  # Clear existing content
-
-    for r_idx, row in enumerate(df_shopping.itertuples(index=False), start=1):
-        for c_idx, value in enumerate(row, start=1):
-            now_sheet.cell(row=r_idx, column=c_idx, value=value)
+    # 시트를 새로 만들고 행 단위로 한 번에 추가 (셀 단위 초기화/쓰기 없음)
+    excel_io.write_dataframe(wb['now_list'], df_shopping)
 
     print("Sheet 'now_list' updated with new shopping data.")
     return
 
 
 def conn_openai_api(prompt):
-    completion = client.chat.completions.create(
-        model=openai_model,
-        messages=[
+    # 동일한 프롬프트는 로컬 캐시에서 응답 (OPENAI_CACHE_BYPASS=1 이면 항상 호출)
+    result = openai_api.chat_completion(
+        client,
+        openai_model,
+        [
             {
                 "role": "user",
                 "content": prompt
@@ -135,8 +134,7 @@ def conn_openai_api(prompt):
     )
 
     # 분석글 출력
-    print(completion.choices[0].message.content)
-    result = completion.choices[0].message.content
+    print(result)
 
     return result
 
@@ -203,8 +201,8 @@ def update_now_report(wb, analysis):
 
 
 def save_close_file(wb):
-    # 9. genai_rpa.xlsx 파일 저장
-    wb.save(file_path)
+    # 9. genai_rpa.xlsx 파일 저장 (임시 파일에 저장 후 이름 변경)
+    excel_io.save_atomic(wb, file_path)
     print("Workbook saved and closed.")
     return
 
@@ -213,32 +211,38 @@ def main():
     # Ensure the workbook exists
     create_workbook_if_not_exists()
 
-    # Open the workbook
-    wb = openpyxl.load_workbook(file_path)
+    # 1-1. 동시에 실행된 다른 작업(03/04 등)과 시트 회전/저장이 섞이지 않도록 파일 잠금
+    #      (다른 실행이 끝날 때까지 최대 WORKBOOK_LOCK_TIMEOUT초 대기)
+    with file_lock.FileLock(file_path):
+        # Open the workbook
+        wb = openpyxl.load_workbook(file_path)
 
-    # 2~5
-    if not handle_list_sheet(wb):
-        wb.close()
-        return
+        # 2~5
+        if not handle_list_sheet(wb):
+            wb.close()
+            return
 
-    # 6. 네이버 API 함수를 호출하여 쇼핑 목록 데이터 가져오기
-    result_json = get_naver_shopping_list_data()
+        # 6. 네이버 API 함수를 호출하여 쇼핑 목록 데이터 가져오기
+        result_json = get_naver_shopping_list_data()
 
-    # 7. result JSON을 pandas DataFrame 형태로 만들기 (순위 열 추가됨)
-    df_shopping = convert_json_to_dataframe(result_json)
-    print("Converted JSON to DataFrame.")
+        # 7. result JSON을 pandas DataFrame 형태로 만들기 (순위 열 추가됨)
+        df_shopping = convert_json_to_dataframe(result_json)
+        print("Converted JSON to DataFrame.")
 
-    # 8. 'now_list' 시트 내용 업데이트
-    update_now_list(wb, df_shopping)
+        # 8. 'now_list' 시트 내용 업데이트
+        update_now_list(wb, df_shopping)
+
+        # 9. OpenAI 분석 결과 생성
+        result_analysis = get_openai_shopping_list_anaysis(wb)
 
-    # 9. OpenAI 분석 결과 생성
-    result_analysis = get_openai_shopping_list_anaysis(wb)
+        # 10. 분석 결과 업데이트
+        update_now_report(wb, result_analysis)
 
-    # 10. 분석 결과 업데이트
-    update_now_report(wb, result_analysis)
+        # 11. 파일 저장 및 종료
+        save_close_file(wb)
 
-    # 11. 파일 저장 및 종료
-    save_close_file(wb)
+    # 12. LLM 사용량/비용/응답시간 리포트 (metrics/llm_run_*.json, metrics/rpa_llm.prom)
+    llm_metrics.export_run_metrics(os.path.join(os.path.dirname(file_path), 'metrics'))
 
 
 if __name__ == '__main__':
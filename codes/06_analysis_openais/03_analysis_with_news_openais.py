@@ -1,6 +1,5 @@
 import openpyxl
 import datetime
-import shutil
 import pandas as pd
 import json
 import os
@@ -11,13 +10,17 @@ from openai import OpenAI
 import os
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rpa_utils import (backup_store, excel_io, file_lock, llm_metrics, naver_api,
+                       news_summarizer, openai_api, shopping_diff)
+
 # .env 파일 로드
 load_dotenv()
 
-# .env에서 값 가져오기
-client_id = os.getenv("NAVER_CLIENT_ID")
-client_secret = os.getenv("NAVER_CLIENT_SECRET")
+# 네이버 API 키(NAVER_CLIENT_ID, NAVER_CLIENT_SECRET)는 rpa_utils.naver_api가 .env에서 읽음
 encText = urllib.parse.quote("포켄스")
+# 쇼핑 조회 상품 수 (0 또는 미설정: 20개, 100 초과 시 페이지 병렬 조회, 최대 1000)
+shop_max_items = int(os.getenv("NAVER_SHOP_MAX_ITEMS", "0")) or 20
 
 # OpenAI API 호출
 client = OpenAI(
@@ -28,6 +31,8 @@ openai_model = "gpt-4o-mini"
 # 1. genai_rpa.xlsx 파일 경로 설정
 current_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)))
 file_path = os.path.join(current_folder, 'genai_rpa.xlsx')
+# 변경된 부분만 압축 저장하는 백업 저장소 (복원: python -m rpa_utils.backup_store <폴더> restore <id> <파일>)
+backups = backup_store.BackupStore(os.path.join(current_folder, 'backups'))
 
 
 def create_workbook_if_not_exists():
@@ -54,7 +59,11 @@ def convert_json_to_dataframe(json_result):
     """
     if isinstance(json_result, str):
         json_result = json.loads(json_result)
-    items = json_result.get('items', [])
+    if isinstance(json_result, dict):
+        items = json_result.get('items', [])
+    else:
+        # 페이징 조회 결과(페이지 dict의 iterable)는 순서대로 이어붙임
+        items = [item for page in json_result for item in page.get('items', [])]
     df = pd.DataFrame(items)
     # "순위" 열을 추가 (1부터 시작하는 일련번호)
     df.insert(0, "순위", range(1, len(df)+1))
@@ -63,52 +72,36 @@ def convert_json_to_dataframe(json_result):
     return df
 
 
-def get_naver_shopping_list_data():
-    # display를 20으로 수정. 페이징을 한다면 start=번호 형태를 추가
-    url = "https://openapi.naver.com/v1/search/shop?sort=date&display=20&query=" + encText # JSON 결과
+def get_naver_shopping_list_data(max_items=20):
+    # 공유 keep-alive 세션, 디스크 캐시, 요청 속도 제한, 재시도는 rpa_utils.naver_api에서 처리
+    # 실패 시 None 반환
+    query = urllib.parse.unquote(encText)
 
-    request = urllib.request.Request(url)
-    request.add_header("X-Naver-Client-Id",client_id)
-    request.add_header("X-Naver-Client-Secret",client_secret)
-    response = urllib.request.urlopen(request)
-    rescode = response.getcode()
-    if(rescode==200):
-        response_body = response.read()
-        # print(response_body.decode('utf-8'))
-    else:
-        print("Error Code:" + rescode)
-    result = response_body.decode('utf-8')
+    # max_items가 100을 넘으면 display=100, start=1,101,...,901 페이지를 병렬로 조회
+    # (한 페이지라도 실패하면 일부만 받은 결과를 쓰지 않도록 None)
+    if max_items > 100:
+        pages = naver_api.fetch_naver_page_texts("shop", query, sort="date", max_items=max_items)
+        if pages is None:
+            return None
+        return [json.loads(page) for page in pages]
 
-    return result
+    # display를 max_items(기본 20)로 설정. 페이징을 한다면 start=번호 형태를 추가
+    return naver_api.fetch_naver_api_data("shop", query, sort="date", display=max_items)
 
 
 def get_naver_news_data():
     """
     Fetch news data from Naver News API.
+    Responses are served from the on-disk cache while still fresh
+    (NAVER_CACHE_BYPASS=1 to always call the API).
     """
-    url = "https://openapi.naver.com/v1/search/news?sort=date&display=20&query=" + encText  # JSON 결과
-
-    request = urllib.request.Request(url)
-    request.add_header("X-Naver-Client-Id", client_id)
-    request.add_header("X-Naver-Client-Secret", client_secret)
-    response = urllib.request.urlopen(request)
-    rescode = response.getcode()
-    if rescode == 200:
-        response_body = response.read()
-    else:
-        print("Error Code:" + rescode)
-        return None
-
-    result = response_body.decode('utf-8')
-    return result
+    return naver_api.fetch_naver_api_data("news", urllib.parse.unquote(encText),
+                                          sort="date", display=20)
 
 
 def handle_list_sheet(wb):
-    # 2. 현재 시각을 기반으로 백업 파일 생성
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    backup_file = os.path.join(current_folder, f"genai_rpa_{timestamp}.xlsx")
-    shutil.copy(file_path, backup_file)
-    print(f"Backup created: {backup_file}")
+    # 2. 백업 (전체 복사 대신 변경된 부분만 백그라운드에서 저장)
+    backups.backup_async(file_path)
 
     # 3. 'prev_list' 시트 삭제 (존재하는 경우)
     if 'prev_list' in wb.sheetnames:
@@ -135,44 +128,46 @@ def handle_list_sheet(wb):
 
 def update_now_list(wb, df_shopping):
     # 8. 'now_list' 시트 내용 업데이트
-    now_sheet = wb['now_list']
-    for row in now_sheet.iter_rows():
-        for cell in row:
-            cell.value = None  # Clear existing content
-
-    for r_idx, row in enumerate(df_shopping.itertuples(index=False), start=1):
-        for c_idx, value in enumerate(row, start=1):
-            now_sheet.cell(row=r_idx, column=c_idx, value=value)
+    # 시트를 새로 만들고 행 단위로 한 번에 추가 (셀 단위 초기화/쓰기 없음)
+    excel_io.write_dataframe(wb['now_list'], df_shopping)
 
     print("Sheet 'now_list' updated with new shopping data.")
     return
 
 
-def conn_openai_api(prompt):
-    completion = client.chat.completions.create(
-        model=openai_model,
-        messages=[
+def update_now_diff(wb, changes):
+    # 8-1. 'now_diff' 시트에 productId 기준 변화표(신규/삭제/가격/순위/분포 변화) 기록
+    if 'now_diff' not in wb.sheetnames:
+        wb.create_sheet(title="now_diff", index=wb.sheetnames.index('now_list') + 1)
+    excel_io.write_dataframe(wb['now_diff'], shopping_diff.changes_to_frame(changes), header=True)
+
+    print("Sheet 'now_diff' updated.")
+    return
+
+
+def conn_openai_api(prompt, label=None):
+    # 동일한 프롬프트는 로컬 캐시에서 응답 (OPENAI_CACHE_BYPASS=1 이면 항상 호출)
+    # 토큰 사용량, 응답 시간, 캐시 여부는 llm_metrics에 label별로 기록
+    result = openai_api.chat_completion(
+        client,
+        openai_model,
+        [
             {
                 "role": "user",
                 "content": prompt
             }
-        ]
+        ],
+        label=label
     )
 
     # 분석글 출력
-    print(completion.choices[0].message.content)
-    result = completion.choices[0].message.content
+    print(result)
 
     return result
 
 
-def get_openai_shopping_list_anaysis(wb):
-    # 각 시트의 전체 데이터를 불러오기
-    prev_sheet = wb['prev_list']
-    now_sheet = wb['now_list']
-
-    prev_data = [[cell.value for cell in row] for row in prev_sheet.iter_rows()]
-    now_data = [[cell.value for cell in row] for row in now_sheet.iter_rows()]
+def get_openai_shopping_list_anaysis(changes):
+    # changes: shopping_diff.compute_changes로 계산한 이전 목록 -> 새 쇼핑 데이터 변화
 
     # 비교 분석을 위한 프롬프트 구성
     # prompt = f"""
@@ -184,13 +179,15 @@ def get_openai_shopping_list_anaysis(wb):
     # markdown 언어나, html 태그와 html 특수기호 등을 사용하지 말아줘.
     # """
 
+    # 원본 셀 전체 대신 로컬에서 계산한 변화분(신규/삭제 상품, 가격/순위 변동, 분포 변화)만 전달
+
     # 개선
     prompt = f"""
     너는 데이터분석 전문가야.
-    다음 두 상품 목록을 비교 분석해 변화 패턴을 도출해주세요:
+    다음은 두 상품 목록(prev_list: 변경 전, now_list: 변경 후)을 productId 기준으로 비교한 변화 데이터야.
+    이를 바탕으로 변화 패턴을 도출해주세요:
     
-    prev_list(변경 전): {prev_data}
-    now_list(변경 후): {now_data}
+    {shopping_diff.summarize_changes(changes)}
     
     분석 요구사항:
     1. 상품 정보의 구조적 변화(형식, 필드값 등) 파악
@@ -206,7 +203,7 @@ def get_openai_shopping_list_anaysis(wb):
     - 마크다운, HTML 태그, 특수기호 사용 금지
     - 실제 소비자에게 유용한 인사이트 중심으로 작성
     """
-    result = conn_openai_api(prompt)
+    result = conn_openai_api(prompt, label="shop_analysis")
 
     return result
 
@@ -214,24 +211,13 @@ def get_openai_shopping_list_anaysis(wb):
 def get_openai_news_summarize(result_news):
     """
     Summarize the news content using OpenAI API.
+    기사가 많아 한 번에 넣을 수 없으면 묶음별로 병렬 요약(map) 후 합쳐서(reduce) 최종 요약
     """
-    prompt = f"""
-    너는 뉴스 요약 전문가야.
-    다음 뉴스 내용을 요약해주세요:
-    
-    뉴스 내용: {result_news}
-    
-    요약 요구사항:
-    1. 주요 뉴스 주제 및 핵심 메시지 요약
-    2. 구체적인 수치, 고유명사, 키워드 포함
-    3. 소비자에게 유용한 인사이트 제공
-    
-    결과물 요청사항:
-    - 한글로 작성, 총 300-400자 이내로 간결하게 작성
-    - 글머리를 활용하여 명확하고 간결한 요약 작성
-    - 마크다운, HTML 태그, 특수기호 사용 금지
-    """
-    result = conn_openai_api(prompt)
+    def complete(prompt, step):
+        label = "news_summary" if step == "final" else f"news_summary:{step}"
+        return conn_openai_api(prompt, label=label)
+
+    result = news_summarizer.summarize_news(result_news, complete)
     return result
 
 
@@ -269,8 +255,8 @@ def update_now_report_with_news(wb, news_analysis):
 
 
 def save_close_file(wb):
-    # 9. genai_rpa.xlsx 파일 저장
-    wb.save(file_path)
+    # 9. genai_rpa.xlsx 파일 저장 (임시 파일에 저장 후 이름 변경)
+    excel_io.save_atomic(wb, file_path)
     print("Workbook saved and closed.")
     return
 
@@ -279,42 +265,60 @@ def main():
     # Ensure the workbook exists
     create_workbook_if_not_exists()
 
-    # Open the workbook
-    wb = openpyxl.load_workbook(file_path)
+    # 1-1. 동시에 실행된 다른 작업과 시트 회전/저장이 섞이지 않도록 파일 잠금
+    #      (다른 실행이 끝날 때까지 최대 WORKBOOK_LOCK_TIMEOUT초 대기)
+    with file_lock.FileLock(file_path):
+        # 이전 목록 읽기 (셀 객체 없이 값만 스트리밍, 아직 회전 전이므로 디스크의 now_list가 이전 목록)
+        prev_df = excel_io.read_snapshot(file_path, 'now_list')
 
-    # 2~5
-    if not handle_list_sheet(wb):
-        wb.close()
-        return
+        # Open the workbook
+        wb = openpyxl.load_workbook(file_path)
 
-    # 6. 네이버 API 함수를 호출하여 쇼핑 목록 데이터 가져오기
-    result_json = get_naver_shopping_list_data()
+        # 2~5
+        if not handle_list_sheet(wb):
+            wb.close()
+            return
 
-    # 7. result JSON을 pandas DataFrame 형태로 만들기 (순위 열 추가됨)
-    df_shopping = convert_json_to_dataframe(result_json)
-    print("Converted JSON to DataFrame.")
+        # 6. 네이버 API 함수를 호출하여 쇼핑 목록 데이터 가져오기
+        result_json = get_naver_shopping_list_data(shop_max_items)
 
-    # 8. 'now_list' 시트 내용 업데이트
-    update_now_list(wb, df_shopping)
+        # 7. result JSON을 pandas DataFrame 형태로 만들기 (순위 열 추가됨)
+        df_shopping = convert_json_to_dataframe(result_json) if result_json else None
+        if df_shopping is None or df_shopping.empty:
+            # 조회 실패/빈 결과면 저장하지 않고 종료 (회전한 시트도 파일에 반영되지 않음)
+            print("Shopping data fetch failed. Workbook left unchanged.")
+            wb.close()
+            return
+        print("Converted JSON to DataFrame.")
+
+        # 8. 'now_list' 시트 내용 업데이트
+        update_now_list(wb, df_shopping)
+
+        # 8-1. 이전 목록과 비교한 변화 계산 (한 번만 계산해 시트와 프롬프트에 같이 사용)
+        changes = shopping_diff.compute_changes(prev_df, df_shopping)
+        update_now_diff(wb, changes)
+
+        # 9. OpenAI 분석 결과 생성
+        result_analysis = get_openai_shopping_list_anaysis(changes)
 
-    # 9. OpenAI 분석 결과 생성
-    result_analysis = get_openai_shopping_list_anaysis(wb)
+        # 10. 분석 결과 업데이트
+        update_now_report(wb, result_analysis)
 
-    # 10. 분석 결과 업데이트
-    update_now_report(wb, result_analysis)
+        # 12. 네이버 뉴스 데이터 가져오기
+        result_news_json = get_naver_news_data()
 
-    # 12. 네이버 뉴스 데이터 가져오기
-    result_news_json = get_naver_news_data()
+        if result_news_json:
+            # 13. OpenAI를 사용하여 뉴스 데이터 요약
+            news_analysis = get_openai_news_summarize(result_news_json)
 
-    if result_news_json:
-        # 13. OpenAI를 사용하여 뉴스 데이터 요약
-        news_analysis = get_openai_news_summarize(result_news_json)
+            # 14. 뉴스 분석 결과 업데이트
+            update_now_report_with_news(wb, news_analysis)
 
-        # 14. 뉴스 분석 결과 업데이트
-        update_now_report_with_news(wb, news_analysis)
+        # 15. 파일 저장 및 종료
+        save_close_file(wb)
 
-    # 15. 파일 저장 및 종료
-    save_close_file(wb)
+    # 16. LLM 사용량/비용/응답시간 리포트 (metrics/llm_run_*.json, metrics/rpa_llm.prom)
+    llm_metrics.export_run_metrics(os.path.join(current_folder, 'metrics'))
 
 
 if __name__ == '__main__':
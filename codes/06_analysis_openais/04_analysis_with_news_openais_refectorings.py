@@ -1,135 +1,238 @@
 import os
 import sys
-import json
-import shutil
 import datetime
-import urllib.request
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import openpyxl
 from openai import OpenAI
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rpa_utils import (backup_store, excel_io, file_lock, llm_metrics, naver_api, naver_parser,
+                       news_summarizer, openai_api, openai_batch, price_index, shopping_diff,
+                       snapshot_store, workbook_backend)
+from rpa_utils.stage_timer import stage
+
 # Load environment variables
 load_dotenv()
 
 # API credentials
-client_id = os.getenv("NAVER_CLIENT_ID")
-client_secret = os.getenv("NAVER_CLIENT_SECRET")
 openai_api_key = os.getenv("OPENAI_API_KEY")
-encText = urllib.parse.quote("포켄스")
+keyword = os.getenv("NAVER_KEYWORD", "포켄스")
+# Comma separated keywords for the nightly batch run (--batch), e.g. NAVER_KEYWORDS=포켄스,펫모닝
+keywords = [k.strip() for k in os.getenv("NAVER_KEYWORDS", keyword).split(",") if k.strip()]
+# 0 = only the first 20 listings, otherwise page through up to this many items (max 1000)
+shop_max_items = int(os.getenv("NAVER_SHOP_MAX_ITEMS", "0"))
+# Same for news; large news sets are summarized map-reduce within this token budget per call
+news_max_items = int(os.getenv("NAVER_NEWS_MAX_ITEMS", "0"))
+news_token_budget = int(os.getenv("NEWS_TOKEN_BUDGET", "6000"))
+# Rows per change type (added/removed/price/rank/...) in the now_diff sheet, 0 = all
+diff_sheet_limit = int(os.getenv("DIFF_SHEET_LIMIT", "0")) or None
 
 # OpenAI client setup
 client = OpenAI(api_key=openai_api_key)
 openai_model = "gpt-4o-mini"
+# Streaming mode for interactive runs (--stream or OPENAI_STREAM=1): partial text is
+# flushed to now_report at checkpoints and kept if the call exceeds the timeout.
+stream_mode = "--stream" in sys.argv or os.getenv("OPENAI_STREAM", "0") == "1"
+stream_timeout = float(os.getenv("OPENAI_STREAM_TIMEOUT", "120"))
+report_lock = threading.Lock()
 
 # File paths
 current_folder = os.path.dirname(os.path.abspath(__file__))
 file_path = os.path.join(current_folder, 'genai_rpa.xlsx')
+metrics_folder = os.path.join(current_folder, 'metrics')
+# Deduplicated workbook backups (python -m rpa_utils.backup_store <folder> list|restore)
+backups = backup_store.BackupStore(os.path.join(current_folder, 'backups'))
+# Every shopping fetch, keyed by (keyword, time); prev_list/now_list are rendered from it
+history = snapshot_store.SnapshotStore()
+# Rolling price statistics per product, updated with each fetch (same database)
+prices = price_index.PriceIndex()
+
+
+def workbook_path_for(query):
+    """
+    Workbook of a keyword in batch mode: genai_rpa.xlsx for the default
+    keyword, genai_rpa_<keyword>.xlsx for the others.
+    """
+    if query == keyword:
+        return file_path
+    return os.path.join(current_folder, f"genai_rpa_{query.replace(os.sep, '_')}.xlsx")
 
 
-def create_workbook_if_not_exists():
+def create_workbook_if_not_exists(path=None):
     """
     Ensure the workbook exists. If not, create it with default sheets.
     """
-    if not os.path.exists(file_path):
+    path = path or file_path
+    if not os.path.exists(path):
         wb = openpyxl.Workbook()
         wb.active.title = "now_list"
         wb.create_sheet(title="now_report")
-        wb.save(file_path)
-        print(f"Workbook created: {file_path}")
+        wb.save(path)
+        print(f"Workbook created: {path}")
     else:
-        print(f"Workbook already exists: {file_path}")
+        print(f"Workbook already exists: {path}")
 
 
 def convert_json_to_dataframe(json_result):
     """
     Convert JSON result to a pandas DataFrame with an added '순위' column.
+    Accepts the raw response text, a parsed dict, or an iterable of page
+    DataFrames/dicts from a paginated fetch. Raw text is parsed straight
+    into typed columns without building the full JSON tree.
     """
-    if isinstance(json_result, str):
-        json_result = json.loads(json_result)
-    items = json_result.get('items', [])
+    if isinstance(json_result, (str, bytes)):
+        return naver_parser.page_to_dataframe(json_result)
+    if isinstance(json_result, dict):
+        items = json_result.get('items', [])
+    else:
+        pages = list(json_result)
+        if all(isinstance(page, pd.DataFrame) for page in pages):
+            return naver_parser.concat_pages(pages)
+        items = [item for page in pages for item in page.get('items', [])]
     df = pd.DataFrame(items)
     df.insert(0, "순위", range(1, len(df) + 1))
     df.set_index("순위", inplace=True)
     return df
 
 
-def fetch_naver_api_data(api_type):
+def fetch_naver_api_data(api_type, query=keyword, use_cache=None):
     """
     Fetch data from Naver API (shopping or news) based on the given type.
+    Fresh responses come from the on-disk cache unless use_cache=False.
+    """
+    return naver_api.fetch_naver_api_data(api_type, query, sort="date", display=20,
+                                          use_cache=use_cache)
+
+
+def fetch_naver_api_pages(api_type, query=keyword, max_items=1000):
     """
-    base_url = f"https://openapi.naver.com/v1/search/{api_type}?sort=date&display=20&query={encText}"
-    request = urllib.request.Request(base_url)
-    request.add_header("X-Naver-Client-Id", client_id)
-    request.add_header("X-Naver-Client-Secret", client_secret)
-    response = urllib.request.urlopen(request)
-    if response.getcode() == 200:
-        return response.read().decode('utf-8')
+    Fetch up to `max_items` results with display=100 pages in parallel.
+    Returns the typed page DataFrames in order for convert_json_to_dataframe,
+    or None if any page failed.
+    """
+    pages = naver_api.fetch_naver_page_texts(api_type, query, sort="date", max_items=max_items)
+    if pages is None:
+        return None
+    return list(naver_parser.iter_page_dataframes(pages))
+
+
+def fetch_shopping_dataframe(query, fetched=None):
+    """
+    The shopping result of `query` as a DataFrame, or None when the fetch
+    failed, came back incomplete or has no items. Callers must stop on None
+    before rotating sheets, storing a snapshot or calling the LLM, so a
+    failed pull is never recorded as "every product removed".
+    `fetched` is the fetch_keywords_data result of a batch run.
+    """
+    if shop_max_items:
+        shopping_data = fetch_naver_api_pages("shop", query=query, max_items=shop_max_items)
+    elif fetched is not None:
+        shopping_data = fetched[(query, "shop")]
     else:
-        print(f"Error Code: {response.getcode()}")
+        shopping_data = fetch_naver_api_data("shop", query=query)
+    if shopping_data is None:
+        return None
+    with stage("shop_parse"):
+        df_shopping = convert_json_to_dataframe(shopping_data)
+    if df_shopping.empty:
+        print(f"No shopping items for '{query}', skipped.")
         return None
+    return df_shopping
 
 
-def handle_list_sheet(wb):
+def fetch_keywords_data(keyword_list, api_types=("shop", "news"), max_concurrency=10):
     """
-    Manage 'now_list' and 'prev_list' sheets in the workbook.
+    Fetch shop and news data for many keywords concurrently.
+    Returns a dict keyed by (keyword, api_type).
     """
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    backup_file = os.path.join(current_folder, f"genai_rpa_{timestamp}.xlsx")
-    shutil.copy(file_path, backup_file)
-    print(f"Backup created: {backup_file}")
+    return naver_api.fetch_keywords(
+        keyword_list, api_types=api_types, max_concurrency=max_concurrency,
+        sort="date", display=20,
+    )
 
-    if 'prev_list' in wb.sheetnames:
-        del wb['prev_list']
-        print("Sheet 'prev_list' deleted.")
 
-    if 'now_list' in wb.sheetnames:
-        wb['now_list'].title = 'prev_list'
-        print("Sheet 'now_list' renamed to 'prev_list'.")
-    else:
-        print("Sheet 'now_list' not found.")
-        return False
+def handle_list_sheet(book, path=None):
+    """
+    Back up the workbook and rotate its 'now_list' and 'prev_list' sheets.
+    """
+    path = path or file_path
+    # only changed parts are stored, in a background thread
+    backups.backup_async(path)
+    return book.rotate_sheets()
 
-    wb.create_sheet(title="now_list", index=wb.sheetnames.index('prev_list') + 1)
-    print("Sheet 'now_list' created.")
-    return True
 
+def update_sheet_with_dataframe(book, name, dataframe):
+    """
+    Replace the content of sheet `name` with the DataFrame in one bulk write.
+    """
+    book.write_frame(name, dataframe)
+    print(f"Sheet '{name}' updated.")
 
-def update_sheet_with_dataframe(sheet, dataframe):
+
+def load_previous_snapshot(query, path):
     """
-    Clear and update the given sheet with data from the DataFrame.
+    The last stored snapshot of `query`. Workbooks from before the history
+    store have none yet, so their now_list (not rotated on disk) is used.
     """
-    for row in sheet.iter_rows():
-        for cell in row:
-            cell.value = None
+    prev_df = history.latest(query)
+    if prev_df is None:
+        prev_df = excel_io.read_snapshot(path, 'now_list')
+    return prev_df
 
-    for r_idx, row in enumerate(dataframe.itertuples(index=False), start=1):
-        for c_idx, value in enumerate(row, start=1):
-            sheet.cell(row=r_idx, column=c_idx, value=value)
-    print(f"Sheet '{sheet.title}' updated.")
+
+def render_list_sheets(book, prev_df, now_df):
+    """
+    Write prev_list/now_list as a view of the latest two snapshots.
+    """
+    update_sheet_with_dataframe(book, 'prev_list', prev_df)
+    update_sheet_with_dataframe(book, 'now_list', now_df)
+
+
+def update_diff_sheet(book, changes):
+    """
+    Write the structured prev -> now changes to the now_diff sheet.
+    """
+    book.write_frame('now_diff', shopping_diff.changes_to_frame(changes, limit=diff_sheet_limit),
+                     header=True)
+    print("Sheet 'now_diff' updated.")
 
 
-def call_openai_api(prompt):
+def call_openai_api(prompt, use_cache=None, on_checkpoint=None, label=None):
     """
     Call OpenAI API with the given prompt and return the response.
+    Identical prompts are answered from the local response cache.
+    In streaming mode, on_checkpoint(partial_text) is called while tokens arrive.
+    Tokens, latency and cache status are recorded in llm_metrics under `label`.
     """
-    completion = client.chat.completions.create(
-        model=openai_model,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return completion.choices[0].message.content
+    messages = [{"role": "user", "content": prompt}]
+    if stream_mode:
+        return openai_api.stream_chat_completion(
+            client, openai_model, messages, on_checkpoint=on_checkpoint,
+            timeout=stream_timeout, use_cache=use_cache, label=label,
+        )
+    return openai_api.chat_completion(client, openai_model, messages,
+                                      use_cache=use_cache, label=label)
 
 
-def generate_analysis_prompt(prev_data, now_data):
+def generate_analysis_prompt(changes, anomalies=None):
     """
     Generate a prompt for analyzing shopping list changes.
+    Only the locally computed changes (shopping_diff.compute_changes) and
+    the price anomalies against each product's history are sent, not the
+    raw sheet rows.
     """
+    change_data = shopping_diff.summarize_changes(changes)
+    if anomalies is not None:
+        change_data += f"\n\n과거 가격 이력 대비 이상 징후:\n{price_index.summarize_anomalies(anomalies)}"
     return f"""
     너는 데이터분석 전문가야.
-    다음 두 상품 목록을 비교 분석해 변화 패턴을 도출해주세요:
+    다음은 두 상품 목록(prev_list: 변경 전, now_list: 변경 후)을 productId 기준으로 비교한 변화 데이터야.
+    이를 바탕으로 변화 패턴을 도출해주세요:
     
-    prev_list(변경 전): {prev_data}
-    now_list(변경 후): {now_data}
+    {change_data}
     
     분석 요구사항:
     1. 상품 정보의 구조적 변화(형식, 필드값 등) 파악
@@ -147,59 +250,223 @@ def generate_analysis_prompt(prev_data, now_data):
     """
 
 
-def update_report_sheet(sheet, title, content, start_row):
+def update_report_sheet(book, title, content, start_row):
     """
-    Update the report sheet with the given title and content starting from a specific row.
+    Update the now_report sheet with the given title and content starting from a specific row.
     """
-    sheet.cell(row=start_row, column=1, value=title)
-    sheet.cell(row=start_row + 1, column=1, value=content)
-    sheet.cell(row=start_row + 1, column=1).alignment = openpyxl.styles.Alignment(wrap_text=True)
+    book.write_cell('now_report', f"A{start_row}", title)
+    book.write_cell('now_report', f"A{start_row + 1}", content, wrap=True)
     print(f"Report updated with '{title}'.")
 
 
-def main():
-    create_workbook_if_not_exists()
-    wb = openpyxl.load_workbook(file_path)
+def generate_news_prompt(news_data):
+    """
+    Generate a prompt for summarizing Naver news results
+    (article lines or partial summaries from news_summarizer).
+    """
+    return f"""
+    너는 뉴스 요약 전문가야.
+    다음 뉴스 내용을 요약해주세요:
+    
+    뉴스 내용: {news_data}
+    
+    요약 요구사항:
+    1. 주요 뉴스 주제 및 핵심 메시지 요약
+    2. 구체적인 수치, 고유명사, 키워드 포함
+    3. 소비자에게 유용한 인사이트 제공
+    
+    결과물 요청사항:
+    - 한글로 작성, 총 300-400자 이내로 간결하게 작성
+    - 글머리를 활용하여 명확하고 간결한 요약 작성
+    - 마크다운, HTML 태그, 특수기호 사용 금지
+    """
+
 
-    if not handle_list_sheet(wb):
-        wb.close()
-        return
+def make_report_checkpoint(book, title, start_row):
+    """
+    Return a callback that writes partial LLM output to now_report and saves
+    the workbook, so a slow streaming generation is visible while it runs.
+    """
+    def checkpoint(partial_text):
+        with report_lock:
+            update_report_sheet(book, title, f"{partial_text} ...(작성 중)", start_row)
+            book.save()
+    return checkpoint
 
-    shopping_data = fetch_naver_api_data("shop")
-    if shopping_data:
-        df_shopping = convert_json_to_dataframe(shopping_data)
-        update_sheet_with_dataframe(wb['now_list'], df_shopping)
-
-        prev_data = [[cell.value for cell in row] for row in wb['prev_list'].iter_rows()]
-        now_data = [[cell.value for cell in row] for row in wb['now_list'].iter_rows()]
-        analysis_prompt = generate_analysis_prompt(prev_data, now_data)
-        analysis_result = call_openai_api(analysis_prompt)
-        update_report_sheet(wb['now_report'], "오픈 마켓 리포트", analysis_result, 4)
-
-    news_data = fetch_naver_api_data("news")
-    if news_data:
-        news_prompt = f"""
-        너는 뉴스 요약 전문가야.
-        다음 뉴스 내용을 요약해주세요:
-        
-        뉴스 내용: {news_data}
-        
-        요약 요구사항:
-        1. 주요 뉴스 주제 및 핵심 메시지 요약
-        2. 구체적인 수치, 고유명사, 키워드 포함
-        3. 소비자에게 유용한 인사이트 제공
-        
-        결과물 요청사항:
-        - 한글로 작성, 총 300-400자 이내로 간결하게 작성
-        - 글머리를 활용하여 명확하고 간결한 요약 작성
-        - 마크다운, HTML 태그, 특수기호 사용 금지
-        """
-        news_summary = call_openai_api(news_prompt)
-        update_report_sheet(wb['now_report'], "네이버 뉴스 분석", news_summary, 7)
-
-    wb.save(file_path)
+
+def make_anomaly_report(book, start_row):
+    """
+    Return a callback that writes the flagged prices to now_report
+    (and saves the workbook in streaming mode).
+    """
+    def report(anomalies):
+        with report_lock:
+            update_report_sheet(book, "가격 이상 감지", price_index.summarize_anomalies(anomalies),
+                                start_row)
+            if stream_mode:
+                book.save()
+    return report
+
+
+def run_shopping_branch(query, prev_df, on_checkpoint=None, on_anomalies=None):
+    """
+    Shop fetch -> DataFrame -> changes and price anomalies -> analysis.
+    Returns (df_shopping, changes, analysis) or (None, None, None).
+    The anomalies are passed to on_anomalies before the LLM call. Only
+    touches the workbook through the callbacks, so it can run next to the
+    news branch.
+    """
+    with stage("shop_fetch"):
+        df_shopping = fetch_shopping_dataframe(query)
+    if df_shopping is None:
+        return None, None, None
+    with stage("shop_diff"):
+        changes = shopping_diff.compute_changes(prev_df, df_shopping)
+    with stage("price_index"):
+        anomalies = price_index.anomalies(prices.update(query, df_shopping))
+    if on_anomalies:
+        on_anomalies(anomalies)
+
+    with stage("shop_analysis_llm"):
+        analysis_result = call_openai_api(generate_analysis_prompt(changes, anomalies),
+                                          on_checkpoint=on_checkpoint, label=f"{query}::shop")
+    return df_shopping, changes, analysis_result
+
+
+def run_news_branch(query, on_checkpoint=None):
+    """
+    News fetch -> summary. Returns the summary text or None.
+    Large result sets are summarized map-reduce style within a token budget.
+    """
+    with stage("news_fetch"):
+        if news_max_items:
+            news_data = list(naver_api.iter_naver_page_texts(
+                "news", query, sort="date", max_items=news_max_items))
+        else:
+            news_data = fetch_naver_api_data("news", query=query)
+    if not news_data:
+        return None
+
+    def complete(prompt, step):
+        if step == "final":
+            return call_openai_api(prompt, on_checkpoint=on_checkpoint, label=f"{query}::news")
+        return call_openai_api(prompt, label=f"{query}::news:{step}")
+
+    with stage("news_summary_llm"):
+        return news_summarizer.summarize_news(
+            news_data, complete, build_final_prompt=generate_news_prompt,
+            token_budget=news_token_budget,
+        )
+
+
+def main(query=keyword, path=None):
+    path = path or file_path
+    create_workbook_if_not_exists(path)
+    # The workbook is locked from load to commit, so an overlapping run on
+    # the same file waits instead of interleaving its rotation with ours.
+    with workbook_backend.workbook_session(path) as book:
+        with stage("prev_read"):
+            prev_df = load_previous_snapshot(query, path)
+
+        shop_checkpoint = news_checkpoint = None
+        if stream_mode:
+            shop_checkpoint = make_report_checkpoint(book, "오픈 마켓 리포트", 4)
+            news_checkpoint = make_report_checkpoint(book, "네이버 뉴스 분석", 7)
+
+        # The shopping and news branches are independent; run them side by side
+        # and keep every other workbook write in this thread.
+        with stage("branches"), ThreadPoolExecutor(max_workers=2) as executor:
+            shop_future = executor.submit(run_shopping_branch, query, prev_df, shop_checkpoint,
+                                          make_anomaly_report(book, 10))
+            news_future = executor.submit(run_news_branch, query, news_checkpoint)
+            df_shopping, changes, analysis_result = shop_future.result()
+            news_summary = news_future.result()
+
+        # rotate only after a complete fetch; a failed one leaves the lists as they are
+        if df_shopping is not None:
+            handle_list_sheet(book, path)
+            with stage("history_append"):
+                history.append(query, df_shopping)
+            with stage("sheet_write"):
+                render_list_sheets(book, prev_df, df_shopping)
+                update_diff_sheet(book, changes)
+            update_report_sheet(book, "오픈 마켓 리포트", analysis_result, 4)
+        if news_summary:
+            update_report_sheet(book, "네이버 뉴스 분석", news_summary, 7)
     print("Workbook saved and closed.")
 
 
+def prepare_batch_prompts(keyword_list):
+    """
+    Batch phase 1: rotate each keyword's workbook, fetch shop/news data,
+    write now_list and collect the analysis/news prompts.
+    Returns {custom_id: prompt} with custom_id '<keyword>::shop' or '<keyword>::news'.
+    """
+    fetched = fetch_keywords_data(keyword_list)
+    prompts = {}
+    for query in keyword_list:
+        path = workbook_path_for(query)
+        create_workbook_if_not_exists(path)
+        with workbook_backend.workbook_session(path) as book:
+            prev_df = load_previous_snapshot(query, path)
+            df_shopping = fetch_shopping_dataframe(query, fetched)
+            if df_shopping is None:
+                book.discard()
+            else:
+                handle_list_sheet(book, path)
+                history.append(query, df_shopping)
+                changes = shopping_diff.compute_changes(prev_df, df_shopping)
+                anomalies = price_index.anomalies(prices.update(query, df_shopping))
+                render_list_sheets(book, prev_df, df_shopping)
+                update_diff_sheet(book, changes)
+                make_anomaly_report(book, 10)(anomalies)
+                prompts[f"{query}::shop"] = generate_analysis_prompt(changes, anomalies)
+
+        news_data = fetched[(query, "news")]
+        if news_data:
+            prompts[f"{query}::news"] = generate_news_prompt(
+                news_summarizer.format_articles(news_summarizer.parse_articles(news_data)))
+    return prompts
+
+
+def main_batch(keyword_list=keywords, poll_interval=60, timeout=None):
+    """
+    Nightly mode: every keyword's analysis and news prompts go into one
+    OpenAI Batch API job; the results are written to each workbook's now_report.
+    """
+    prompts = prepare_batch_prompts(keyword_list)
+    if not prompts:
+        print("No prompts to submit.")
+        return
+
+    requests = [
+        openai_batch.build_batch_request(
+            custom_id, openai_model, [{"role": "user", "content": prompt}])
+        for custom_id, prompt in prompts.items()
+    ]
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    batch_file = os.path.join(current_folder, "batches", f"genai_rpa_batch_{timestamp}.jsonl")
+    results = openai_batch.run_batch(client, requests, batch_file,
+                                     poll_interval=poll_interval, timeout=timeout)
+
+    for query in keyword_list:
+        analysis_result = results.get(f"{query}::shop")
+        news_summary = results.get(f"{query}::news")
+        if analysis_result is None and news_summary is None:
+            continue
+        path = workbook_path_for(query)
+        with workbook_backend.workbook_session(path) as book:
+            if analysis_result is not None:
+                update_report_sheet(book, "오픈 마켓 리포트", analysis_result, 4)
+            if news_summary is not None:
+                update_report_sheet(book, "네이버 뉴스 분석", news_summary, 7)
+    print(f"Batch results written for {len(keyword_list)} keywords.")
+
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if "--batch" in sys.argv:
+        main_batch()
+    else:
+        main()
+    llm_metrics.export_run_metrics(metrics_folder)
+    file_lock.export_lock_metrics(metrics_folder)
@@ -0,0 +1,119 @@
+"""
+End-to-end load test of 04_analysis_with_news_openais_refectorings.main()
+against local stand-ins for the Naver search API and OpenAI.
+
+    python 05_load_test_with_mocks.py --keywords 50 --naver-latency 0.05 --openai-latency 0.5
+
+No credentials are needed. Every keyword gets its own workbook in a
+temporary folder; throughput and p50/p95 latency per stage are printed
+at the end. --batch runs the nightly main_batch() against the mock
+Batch API instead.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import importlib.util
+
+current_folder = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(current_folder))
+from rpa_utils import backup_store, file_lock, llm_metrics, stage_timer
+from rpa_utils.mock_servers import MockNaverServer, MockOpenAIServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the analysis pipeline with mock servers.")
+    parser.add_argument("--keywords", type=int, default=20, help="number of keywords to run")
+    parser.add_argument("--naver-latency", type=float, default=0.05, help="Naver mock latency (sec)")
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="OpenAI mock latency (sec)")
+    parser.add_argument("--naver-error-rate", type=float, default=0.0, help="share of Naver 429 responses")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="share of OpenAI 500 responses")
+    parser.add_argument("--batch", action="store_true", help="run main_batch() (OpenAI Batch API mode)")
+    parser.add_argument("--token-delay", type=float, default=0.0,
+                        help="delay between streamed chunks, used with OPENAI_STREAM=1")
+    parser.add_argument("--batch-delay", type=float, default=1.0, help="seconds until a mock batch completes")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    return parser.parse_args()
+
+
+def load_pipeline(work_dir):
+    """
+    Import the refactored analysis script as a module.
+    Environment variables must be set before this is called.
+    """
+    path = os.path.join(current_folder, "04_analysis_with_news_openais_refectorings.py")
+    spec = importlib.util.spec_from_file_location("analysis_pipeline", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.current_folder = work_dir
+    module.backups = backup_store.BackupStore(os.path.join(work_dir, "backups"))
+    return module
+
+
+def print_report(summary, elapsed, keyword_count, failures):
+    print(f"\nKeywords: {keyword_count}, failures: {failures}, elapsed: {elapsed:.2f}s, "
+          f"throughput: {keyword_count / elapsed:.2f} keywords/s")
+    print(f"{'stage':<20}{'count':>7}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}{'total(s)':>10}")
+    for name, s in summary.items():
+        print(f"{name:<20}{s['count']:>7}{s['p50'] * 1000:>10.1f}{s['p95'] * 1000:>10.1f}"
+              f"{s['max'] * 1000:>10.1f}{s['total']:>10.2f}")
+
+
+def main():
+    args = parse_args()
+    work_dir = tempfile.mkdtemp(prefix="rpa_load_test_")
+
+    naver = MockNaverServer(latency=args.naver_latency, error_rate=args.naver_error_rate)
+    openai_server = MockOpenAIServer(latency=args.openai_latency, batch_delay=args.batch_delay,
+                                     token_delay=args.token_delay,
+                                     error_rate=args.openai_error_rate, error_status=500)
+    with naver, openai_server:
+        os.environ.update({
+            "NAVER_API_BASE_URL": naver.base_url,
+            "NAVER_CLIENT_ID": "mock",
+            "NAVER_CLIENT_SECRET": "mock",
+            "NAVER_CACHE_BYPASS": "1",
+            "NAVER_RATE_PER_SEC": "1000",
+            "NAVER_RATE_BURST": "1000",
+            "RPA_CACHE_DIR": os.path.join(work_dir, ".cache"),
+            "RPA_SNAPSHOT_DB": os.path.join(work_dir, ".history", "snapshots.sqlite"),
+            "OPENAI_BASE_URL": f"{openai_server.base_url}/v1",
+            "OPENAI_API_KEY": "mock",
+        })
+        pipeline = load_pipeline(work_dir)
+
+        stage_timer.reset()
+        failures = 0
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull:
+            if args.batch:
+                output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+                pipeline.file_path = os.path.join(work_dir, "genai_rpa.xlsx")
+                keyword_list = [f"키워드{i:04d}" for i in range(args.keywords)]
+                with output, stage_timer.stage("batch_total"):
+                    pipeline.main_batch(keyword_list, poll_interval=0.2)
+            for i in range(0 if args.batch else args.keywords):
+                query = f"키워드{i:04d}"
+                pipeline.file_path = os.path.join(work_dir, f"genai_rpa_{i:04d}.xlsx")
+                output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+                try:
+                    with output, stage_timer.stage("keyword_total"):
+                        pipeline.main(query)
+                except Exception as e:
+                    failures += 1
+                    print(f"{query} failed: {e}")
+            with contextlib.redirect_stdout(devnull):
+                backup_store.wait_for_backups()
+        elapsed = time.perf_counter() - started
+
+    print_report(stage_timer.summarize(), elapsed, args.keywords, failures)
+    print(f"Naver requests: {naver.request_count}, OpenAI requests: {openai_server.request_count}")
+    llm_metrics.export_run_metrics(os.path.join(work_dir, "metrics"))
+    file_lock.export_lock_metrics(os.path.join(work_dir, "metrics"))
+    print(f"Workbooks written to {work_dir}")
+
+
+if __name__ == '__main__':
+    main()
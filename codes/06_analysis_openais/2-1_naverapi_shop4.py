@@ -1,26 +1,33 @@
-import xlwings as xw
 import datetime
-import shutil
 import pandas as pd
 import json
 import os
 import sys
 import urllib.request
 from openai import OpenAI
+from dotenv import load_dotenv
 
-client_id = ""
-client_secret = ""
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rpa_utils import (backup_store, excel_io, llm_metrics, naver_api, openai_api,
+                       workbook_backend)
+
+# .env 파일 로드 (NAVER_CLIENT_ID, NAVER_CLIENT_SECRET, OPENAI_API_KEY)
+load_dotenv()
 encText = urllib.parse.quote("포켄스")
 
 # OpenAI API 호출
 client = OpenAI(
-api_key='',
+api_key=os.getenv("OPENAI_API_KEY"),
 )
 openai_model = "gpt-4o-mini"
 
-# 1. genai_rpa.xlsx 파일 열기
-file_path = 'genai_rpa.xlsx'
-wb = xw.Book(file_path)
+# 1. genai_rpa.xlsx 파일 경로
+# WORKBOOK_BACKEND=xlwings 이면 Excel을 직접 구동, 기본값 openpyxl은 Excel 없이(리눅스 포함) 실행
+current_folder = os.path.dirname(os.path.abspath(__file__))
+file_path = os.path.join(current_folder, 'genai_rpa.xlsx')
+# main()에서 파일 잠금 후 workbook_session으로 열림
+wb = None
+backups = backup_store.BackupStore(os.path.join(current_folder, 'backups'))
 
 
 def convert_json_to_dataframe(json_result):
@@ -43,68 +50,40 @@ def convert_json_to_dataframe(json_result):
 
 def get_naver_shopping_list_data():
     # display를 20으로 수정. 페이징을 한다면 start=번호 형태를 추가
-    url = "https://openapi.naver.com/v1/search/shop?sort=date&display=20&query=" + encText # JSON 결과
-
-    request = urllib.request.Request(url)
-    request.add_header("X-Naver-Client-Id",client_id)
-    request.add_header("X-Naver-Client-Secret",client_secret)
-    response = urllib.request.urlopen(request)
-    rescode = response.getcode()
-    if(rescode==200):
-        response_body = response.read()
-        # print(response_body.decode('utf-8'))
-    else:
-        print("Error Code:" + rescode)
-    result = response_body.decode('utf-8')
-
-    return result
+    # 공유 keep-alive 세션, 디스크 캐시, 재시도는 rpa_utils.naver_api에서 처리
+    return naver_api.fetch_naver_api_data("shop", urllib.parse.unquote(encText),
+                                          sort="date", display=20)
 
 
 def handle_list_sheet():
-    # 2. 현재 시각을 기반으로 백업 파일 생성
-    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
-    backup_file = f"genai_rpa_{timestamp}.xlsx"
-    shutil.copy(file_path, backup_file)
-    print(f"Backup created: {backup_file}")
-
-    # 3. 'prev_list' 시트 삭제 (존재하는 경우)
-    sheet_names = [s.name for s in wb.sheets]
-    if 'prev_list' in sheet_names:
-        wb.sheets['prev_list'].delete()
-        print("Sheet 'prev_list' deleted.")
-    else:
-        print("Sheet 'prev_list' does not exist. Skipping deletion.")
-
-    # 4. 'now_list' 시트의 이름을 'prev_list'로 변경
-    if 'now_list' in sheet_names:
-        wb.sheets['now_list'].name = 'prev_list'
-        print("Sheet 'now_list' renamed to 'prev_list'.")
-    else:
-        print("Sheet 'now_list' not found. Please check the workbook.")
-        wb.close()
-        return
+    # 2. 백업 (변경된 부분만 압축 저장, 백그라운드 실행)
+    if os.path.exists(file_path):
+        backups.backup_async(file_path)
 
-    # 5. 새로운 'now_list' 시트 생성
-    new_sheet = wb.sheets.add(name="now_list", after=wb.sheets['prev_list'])
-    print("Sheet 'now_list' created.")
+    # 3~5. 'prev_list' 삭제, 'now_list' -> 'prev_list' 이름 변경, 새 'now_list' 생성
+    if not wb.rotate_sheets():
+        print("Sheet 'now_list' not found. Please check the workbook.")
+        wb.discard()
+        return False
 
-    return
+    return True
 
 
 def update_now_list(df_shopping):
     # 8. 'now_list' 시트 내용 업데이트 (기존 내용 클리어 후 A1셀부터 DataFrame 쓰기)
-    now_sheet = wb.sheets['now_list']
-    now_sheet.clear()
-    now_sheet.range('A1').value = df_shopping
+    # 셀 단위가 아닌 한 번의 범위 쓰기로 처리 (xlwings에서도 COM 호출 1회)
+    # 헤더 행과 순위(index) 열을 함께 기록 (읽을 때 shopping_diff.rows_to_dataframe이 순위 열을 제거)
+    wb.write_frame('now_list', df_shopping.reset_index(), header=True)
     print("Sheet 'now_list' updated with new shopping data.")
 
     return
 
 
 def conn_openai_api(prompt):
-    completion = client.chat.completions.create(
-        model=openai_model,
-        messages=[
+    result = openai_api.chat_completion(
+        client,
+        openai_model,
+        [
             {
                 "role": "user",
                 "content": prompt
@@ -113,19 +92,15 @@ def conn_openai_api(prompt):
     )
 
     # 분석글 출력
-    print(completion.choices[0].message.content)
-    result = completion.choices[0].message.content
+    print(result)
 
     return result
 
 
 def get_openai_shopping_list_anaysis():
-    # 각 시트의 전체 데이터를 불러오기 (테이블 형태이므로 used_range로 모든 셀을 가져옴)
-    prev_sheet = wb.sheets['prev_list']
-    now_sheet = wb.sheets['now_list']
-
-    prev_data = prev_sheet.used_range.value
-    now_data = now_sheet.used_range.value
+    # 각 시트의 전체 데이터를 불러오기 (시트 전체를 한 번의 범위 읽기로 가져옴)
+    prev_data = excel_io.dataframe_to_rows(wb.read_frame('prev_list'), header=True)
+    now_data = excel_io.dataframe_to_rows(wb.read_frame('now_list'), header=True)
 
     # 비교 분석을 위한 프롬프트 구성
     prompt = f"""
@@ -142,26 +117,20 @@ def get_openai_shopping_list_anaysis():
 
 
 def update_now_report(analysis):
-    now_sheet = wb.sheets['now_report']
-
     # 현재 날짜와 시간(년-월-일 시:분:초) 포맷팅
     current_dt = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    # A3 셀에 값 입력
-    now_sheet.range("A3").value = current_dt+" 기준"
-    # A3 셀을 오른쪽 정렬 (엑셀의 상수 xlRight = -4152)
-    now_sheet.range("A3").api.HorizontalAlignment = -4152
+    # A3 셀에 값 입력 후 오른쪽 정렬
+    wb.write_cell('now_report', "A3", current_dt+" 기준", align="right")
 
-    now_sheet.range('A5').value = analysis
-    now_sheet.range('A5').api.WrapText = True  # 줄바꿈 활성화
+    wb.write_cell('now_report', 'A5', analysis, wrap=True)  # 줄바꿈 활성화
     print("Sheet 'now_report' updated with new analysis.")
 
     return
 
 
 def save_close_file():
-    # 9. genai_rpa.xlsx 파일 저장 및 종료
-    wb.save(file_path)
-    wb.close()
+    # 9. genai_rpa.xlsx 파일 저장 (임시 파일에 저장 후 이름 변경), 닫기와 잠금 해제는 세션이 처리
+    wb.commit()
     print("Workbook saved and closed.")
 
     return
@@ -169,25 +138,33 @@ def save_close_file():
 
 
 def main():
-    #2~5
-    handle_list_sheet()
+    global wb
+    # 1-1. 동시에 실행된 다른 작업(03/04 등)과 시트 회전/저장이 섞이지 않도록 파일 잠금 후 열기
+    #      (다른 실행이 끝날 때까지 최대 WORKBOOK_LOCK_TIMEOUT초 대기)
+    with workbook_backend.workbook_session(file_path) as wb:
+        #2~5
+        if not handle_list_sheet():
+            return
 
-    # 6. 네이버 API 함수를 호출하여 쇼핑 목록 데이터 가져오기
-    result_json = get_naver_shopping_list_data()
+        # 6. 네이버 API 함수를 호출하여 쇼핑 목록 데이터 가져오기
+        result_json = get_naver_shopping_list_data()
 
-    # 7. result JSON을 pandas DataFrame 형태로 만들기 (순위 열 추가됨)
-    df_shopping = convert_json_to_dataframe(result_json)
-    print("Converted JSON to DataFrame.")
+        # 7. result JSON을 pandas DataFrame 형태로 만들기 (순위 열 추가됨)
+        df_shopping = convert_json_to_dataframe(result_json)
+        print("Converted JSON to DataFrame.")
 
-    # 8. 'now_list' 시트 내용 업데이트 (기존 내용 클리어 후 A1셀부터 DataFrame 쓰기)
-    update_now_list(df_shopping)
+        # 8. 'now_list' 시트 내용 업데이트 (기존 내용 클리어 후 A1셀부터 DataFrame 쓰기)
+        update_now_list(df_shopping)
+
+        result_analysis = get_openai_shopping_list_anaysis()
 
-    result_analysis = get_openai_shopping_list_anaysis()
+        update_now_report(result_analysis)
 
-    update_now_report(result_analysis)
+        # 9. genai_rpa.xlsx 파일 저장 및 종료
+        save_close_file()
 
-    # 9. genai_rpa.xlsx 파일 저장 및 종료
-    save_close_file()
+    # 10. LLM 사용량/비용/응답시간 리포트 (metrics/llm_run_*.json, metrics/rpa_llm.prom)
+    llm_metrics.export_run_metrics(os.path.join(current_folder, 'metrics'))
 
 
 if __name__ == '__main__':
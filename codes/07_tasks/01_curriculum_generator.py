@@ -1,16 +1,152 @@
 import os
+import re
+import csv
+import sys
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from openai import OpenAI
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rpa_utils import llm_metrics
+from rpa_utils.json_repair import loads_lenient
+
 # 환경 변수 로드
 load_dotenv()
 
 # OpenAI 클라이언트 초기화
 client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
+# 커리큘럼 생성 모델 (gpt-4o 계열은 JSON schema 강제, 그 외는 JSON mode 사용)
+curriculum_model = os.getenv("CURRICULUM_MODEL", "gpt-3.5-turbo")
+# 응답이 길이 제한으로 잘렸을 때 이어쓰기 요청 최대 횟수
+MAX_CONTINUATIONS = 2
+
+SYSTEM_PROMPT = "당신은 교육 전문가입니다. 주어진 주제에 대한 상세한 강의 커리큘럼을 JSON 형식으로 생성해주세요."
+
+LECTURE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "content": {"type": "string"},
+        "duration": {"type": "integer"},
+    },
+    "required": ["title", "content", "duration"],
+    "additionalProperties": False,
+}
+CURRICULUM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "topic": {"type": "string"},
+        "description": {"type": "string"},
+        "total_hours": {"type": "integer"},
+        "lectures": {"type": "array", "items": LECTURE_SCHEMA},
+    },
+    "required": ["topic", "description", "total_hours", "lectures"],
+    "additionalProperties": False,
+}
+REMAINING_SCHEMA = {
+    "type": "object",
+    "properties": {"lectures": {"type": "array", "items": LECTURE_SCHEMA}},
+    "required": ["lectures"],
+    "additionalProperties": False,
+}
+
+
+def response_format_for(model, name="curriculum", schema=CURRICULUM_SCHEMA):
+    """모델이 structured output을 지원하면 JSON schema, 아니면 JSON mode"""
+    if model.startswith(("gpt-4o", "gpt-4.1")):
+        return {"type": "json_schema", "json_schema": {"name": name, "schema": schema, "strict": True}}
+    return {"type": "json_object"}
+
+
+def is_valid_lecture(lecture):
+    """강의 항목이 스키마(title, content: 문자열, duration: 양의 정수)를 만족하는지 확인"""
+    return (
+        isinstance(lecture, dict)
+        and isinstance(lecture.get("title"), str) and lecture["title"].strip() != ""
+        and isinstance(lecture.get("content"), str) and lecture["content"].strip() != ""
+        and isinstance(lecture.get("duration"), int) and lecture["duration"] > 0
+    )
+
+
+def continue_generation(messages, partial_text, label):
+    """길이 제한으로 잘린 응답을 처음부터 다시 만들지 않고 끊긴 지점부터 이어서 받기"""
+    response = llm_metrics.metered_create(
+        client,
+        label=f"{label}:continue",
+        model=curriculum_model,
+        messages=messages + [
+            {"role": "assistant", "content": partial_text},
+            {"role": "user", "content": "응답이 중간에 끊겼습니다. 앞부분을 반복하지 말고 끊긴 바로 다음 문자부터 JSON을 이어서 작성해주세요."},
+        ],
+    )
+    choice = response.choices[0]
+    return choice.message.content or "", choice.finish_reason
+
+
+def repair_lecture(topic, lectures, index, label):
+    """스키마에 맞지 않는 강의 하나만 다시 생성 (나머지 강의는 그대로 유지)"""
+    previous_title = lectures[index - 1].get("title") if index > 0 and isinstance(lectures[index - 1], dict) else None
+    prompt = f"""
+    강의 주제 '{topic}' 커리큘럼의 {index + 1}번째 강의 항목이 손상되었습니다.
+    손상된 항목: {json.dumps(lectures[index], ensure_ascii=False)}
+    이전 강의 제목: {previous_title}
+
+    이 강의 항목 하나만 다음 JSON 형식으로 완성해주세요:
+    {{"title": "강의 제목", "content": "강의 내용 (3-4줄)", "duration": 소요 시간(분, 정수)}}
+    """
+    response = llm_metrics.metered_create(
+        client,
+        label=f"{label}:repair",
+        model=curriculum_model,
+        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        response_format=response_format_for(curriculum_model, "lecture", LECTURE_SCHEMA),
+    )
+    try:
+        lecture, _ = loads_lenient(response.choices[0].message.content)
+    except json.JSONDecodeError:
+        return None
+    return lecture if is_valid_lecture(lecture) else None
+
+
+def request_remaining_lectures(topic, description, total_hours, lectures, label):
+    """잘려서 빠진 뒤쪽 강의만 추가 생성 (이미 받은 강의는 그대로 유지), 실패하면 None"""
+    remaining = total_hours * 60 - sum(lecture["duration"] for lecture in lectures)
+    written = "\n".join(f"    {i + 1}. {lecture['title']} ({lecture['duration']}분)"
+                         for i, lecture in enumerate(lectures))
+    prompt = f"""
+    강의 주제 '{topic}' ({description}) {total_hours}시간 커리큘럼 중 앞부분 강의만 작성되었습니다.
+    작성된 강의:
+{written}
+
+    작성된 강의를 반복하지 말고 이어지는 나머지 강의만 작성해주세요.
+    나머지 강의의 소요 시간 합계는 정확히 {remaining}분이어야 합니다.
+    다음 JSON 형식을 사용해주세요:
+    {{"lectures": [{{"title": "강의 제목", "content": "강의 내용 (3-4줄)", "duration": 소요 시간(분, 정수)}}, ...]}}
+    """
+    response = llm_metrics.metered_create(
+        client,
+        label=f"{label}:remaining",
+        model=curriculum_model,
+        messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+        response_format=response_format_for(curriculum_model, "remaining_lectures", REMAINING_SCHEMA),
+    )
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        return None
+    try:
+        result, repaired = loads_lenient(choice.message.content or "")
+    except json.JSONDecodeError:
+        return None
+    more = result.get("lectures") if isinstance(result, dict) and not repaired else None
+    if not isinstance(more, list) or not more or not all(is_valid_lecture(lecture) for lecture in more):
+        return None
+    return more
+
+
 def generate_curriculum(topic, description, total_hours):
     """OpenAI를 사용하여 강의 커리큘럼 생성"""
     prompt = f"""
@@ -35,22 +171,84 @@ def generate_curriculum(topic, description, total_hours):
         ]
     }}
     """
-    
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "당신은 교육 전문가입니다. 주어진 주제에 대한 상세한 강의 커리큘럼을 JSON 형식으로 생성해주세요."},
-            {"role": "user", "content": prompt}
-        ]
+    label = f"curriculum::{topic}"
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+    # 토큰 사용량과 응답 시간을 llm_metrics에 기록
+    response = llm_metrics.metered_create(
+        client,
+        label=label,
+        model=curriculum_model,
+        messages=messages,
+        response_format=response_format_for(curriculum_model),
     )
-    
-    # JSON 문자열을 파이썬 객체로 변환
+    content = response.choices[0].message.content or ""
+    finish_reason = response.choices[0].finish_reason
+
+    # 1. 길이 제한으로 잘린 경우: 전체 재생성 대신 이어쓰기
+    for _ in range(MAX_CONTINUATIONS):
+        if finish_reason != "length":
+            break
+        print(f"응답이 잘려 이어서 생성합니다: {topic}")
+        more, finish_reason = continue_generation(messages, content, label)
+        content += more
+
+    # 2. JSON 파싱 (코드블록 제거, 잘린 끝부분은 마지막 완성된 값까지 살려서 닫기)
     try:
-        curriculum_json = json.loads(response.choices[0].message.content)
-        return curriculum_json
+        curriculum_json, repaired = loads_lenient(content)
     except json.JSONDecodeError as e:
         print(f"JSON 파싱 오류: {e}")
         return None
+    if repaired:
+        print(f"잘린 JSON을 복구했습니다: {topic}")
+    if not isinstance(curriculum_json, dict):
+        print("JSON 형식 오류: 최상위 값이 객체가 아닙니다.")
+        return None
+
+    # 3. 입력값으로 알 수 있는 필드는 로컬에서 보정
+    curriculum_json.setdefault("topic", topic)
+    curriculum_json.setdefault("description", description)
+    if not isinstance(curriculum_json.get("total_hours"), int):
+        curriculum_json["total_hours"] = total_hours
+    lectures = curriculum_json.get("lectures")
+    if not isinstance(lectures, list) or not lectures:
+        print("강의 목록이 없습니다.")
+        return None
+
+    # 4. 스키마에 맞지 않는 강의만 부분 재생성
+    #    보정에 실패하면 강의가 빠진(총 시간이 맞지 않는) 커리큘럼 대신 실패(None)로 처리
+    fixed = []
+    for index, lecture in enumerate(lectures):
+        if is_valid_lecture(lecture):
+            fixed.append(lecture)
+            continue
+        print(f"{index + 1}번째 강의 항목을 보정합니다: {topic}")
+        lecture = repair_lecture(topic, lectures, index, label)
+        if lecture is None:
+            print(f"{index + 1}번째 강의 항목 보정 실패: {topic}")
+            return None
+        fixed.append(lecture)
+
+    # 5. 잘린 JSON을 복구해 뒤쪽 강의가 빠지는 등 강의 시간 합계가 총 강의 시간보다 모자라면 빠진 뒤쪽 강의만 추가 요청
+    #    끝내 합계가 맞지 않으면 강의가 빠진 커리큘럼을 저장하지 않고 실패(None)로 처리
+    expected = total_hours * 60
+    planned = sum(lecture["duration"] for lecture in fixed)
+    if planned < expected:
+        print(f"빠진 강의를 추가로 요청합니다: {topic} ({planned}/{expected}분)")
+        more = request_remaining_lectures(topic, description, total_hours, fixed, label)
+        if more is None:
+            print(f"빠진 강의 추가 생성 실패: {topic}")
+            return None
+        fixed += more
+        planned = sum(lecture["duration"] for lecture in fixed)
+    if planned != expected:
+        print(f"강의 시간 합계가 총 강의 시간과 다릅니다: {topic} ({planned}/{expected}분)")
+        return None
+    curriculum_json["lectures"] = fixed
+    return curriculum_json
 
 def save_to_excel(curriculum_json, output_file):
     """생성된 커리큘럼을 엑셀 파일로 저장"""
@@ -121,6 +319,119 @@ def save_to_excel(curriculum_json, output_file):
         json.dump(curriculum_json, f, ensure_ascii=False, indent=2)
     print(f"JSON 파일이 {json_file}에 저장되었습니다.")
 
+def parse_total_hours(value, default=12):
+    """total_hours 셀 값을 정수 시간으로 변환 (12, "12", "12.0", "12h", "12시간"), 잘못된 값이면 None"""
+    if value is None or str(value).strip() == "":
+        return default
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*(?:h|hr|hrs|hours?|시간)?", str(value).strip(), re.IGNORECASE)
+    if not match:
+        return None
+    hours = float(match.group(1))
+    return int(hours) if hours.is_integer() and hours > 0 else None
+
+
+def read_topics(input_file):
+    """
+    CSV/XLSX에서 (topic, description, total_hours) 목록 읽기 (첫 행은 헤더)
+    total_hours가 잘못된 행은 전체 작업을 멈추지 않고 건너뛴 뒤 행 번호와 함께 출력
+    """
+    if input_file.lower().endswith(".csv"):
+        with open(input_file, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        wb = load_workbook(input_file, read_only=True)
+        values = wb.active.iter_rows(values_only=True)
+        headers = [str(h).strip() for h in next(values)]
+        rows = [dict(zip(headers, row)) for row in values]
+        wb.close()
+
+    topics = []
+    skipped = []
+    for line, row in enumerate(rows, start=2):
+        if not row.get("topic"):
+            continue
+        total_hours = parse_total_hours(row.get("total_hours"))
+        if total_hours is None:
+            skipped.append(f"{line}행 {row['topic']} (total_hours={row.get('total_hours')!r})")
+            continue
+        topics.append({
+            "topic": str(row["topic"]).strip(),
+            "description": str(row.get("description") or "").strip(),
+            "total_hours": total_hours,
+        })
+    if skipped:
+        print(f"잘못된 행 {len(skipped)}개를 건너뜁니다: {', '.join(skipped)}")
+    return topics
+
+
+def safe_filename(name):
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", name).strip("_")
+
+
+def generate_curricula(topics, output_dir, max_workers=8):
+    """
+    여러 주제의 커리큘럼을 동시에 생성 (최대 max_workers개 병렬)
+    - 완료되는 대로 주제별 JSON 저장, 통합 엑셀(curriculum_catalog.xlsx)에 행 추가
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # write-only 통합 워크북: 결과가 도착하는 순서대로 행을 스트리밍
+    catalog = Workbook(write_only=True)
+    summary_ws = catalog.create_sheet("강의 목록")
+    summary_ws.append(["강의 주제", "강의 설명", "총 강의 시간", "강의 수", "JSON 파일"])
+    lecture_ws = catalog.create_sheet("강의 커리큘럼")
+    lecture_ws.append(["강의 주제", "강의 제목", "강의 내용", "소요 시간(분)"])
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(generate_curriculum, t["topic"], t["description"], t["total_hours"]): t
+            for t in topics
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            topic = futures[future]["topic"]
+            try:
+                curriculum_json = future.result()
+            except Exception as e:
+                print(f"[{done}/{len(topics)}] {topic} 생성 실패: {e}")
+                curriculum_json = None
+            if not curriculum_json:
+                failed.append(topic)
+                continue
+
+            json_file = os.path.join(output_dir, f"curriculum_{safe_filename(topic)}.json")
+            with open(json_file, 'w', encoding='utf-8') as f:
+                json.dump(curriculum_json, f, ensure_ascii=False, indent=2)
+
+            # as_completed 루프(메인 스레드)에서만 워크북에 쓰므로 잠금 불필요
+            lectures = curriculum_json.get("lectures", [])
+            summary_ws.append([
+                curriculum_json.get("topic", topic), curriculum_json.get("description"),
+                curriculum_json.get("total_hours"), len(lectures), os.path.basename(json_file),
+            ])
+            for lecture in lectures:
+                lecture_ws.append([
+                    topic, lecture.get("title"), lecture.get("content"), lecture.get("duration"),
+                ])
+            print(f"[{done}/{len(topics)}] {topic} 완료")
+
+    catalog_file = os.path.join(output_dir, "curriculum_catalog.xlsx")
+    catalog.save(catalog_file)
+    print(f"통합 커리큘럼이 {catalog_file}에 저장되었습니다. (성공 {len(topics) - len(failed)}, 실패 {len(failed)})")
+    if failed:
+        print(f"실패한 주제: {', '.join(failed)}")
+    return catalog_file, failed
+
+
+def main_batch(input_file, max_workers=8):
+    """주제 목록 파일(CSV/XLSX: topic, description, total_hours)로 일괄 생성"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    topics = read_topics(input_file)
+    print(f"{len(topics)}개 주제의 커리큘럼을 생성하는 중... (동시 {max_workers}개)")
+    generate_curricula(topics, os.path.join(current_dir, "curricula"), max_workers=max_workers)
+    llm_metrics.export_run_metrics(os.path.join(current_dir, "metrics"))
+
+
 def main():
     # 사용자 입력 받기
     # topic = input("강의 주제를 입력하세요: ")
@@ -149,5 +460,12 @@ def main():
     else:
         print("커리큘럼 생성에 실패했습니다.")
 
+    # LLM 사용량/비용/응답시간 리포트 저장
+    llm_metrics.export_run_metrics(os.path.join(current_dir, "metrics"))
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 사용법: python 01_curriculum_generator.py topics.csv [동시 실행 수]
+    if len(sys.argv) > 1:
+        main_batch(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 8)
+    else:
+        main()
\ No newline at end of file
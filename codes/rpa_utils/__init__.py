@@ -0,0 +1,6 @@
+"""
+Shared helpers for the RPA scripts (Naver API, OpenAI, workbook handling).
+
+The numbered scripts add the parent ``codes`` folder to ``sys.path`` and
+import from this package, e.g. ``from rpa_utils import naver_api``.
+"""
@@ -0,0 +1,218 @@
+import io
+import os
+import sys
+import json
+import time
+import zlib
+import hashlib
+import zipfile
+import datetime
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of backups kept per workbook, and optional maximum age in days
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "30"))
+BACKUP_MAX_AGE_DAYS = float(os.getenv("BACKUP_MAX_AGE_DAYS", "0")) or None
+# Unreferenced objects younger than this are left alone by prune(), so a
+# backup that is being written by another process is never collected.
+ORPHAN_GRACE_SECONDS = 3600
+
+# One background writer per process keeps backups off the critical path
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class BackupStore:
+    """
+    Content-addressed, compressed backups of xlsx workbooks.
+
+    An xlsx file is a zip of parts (one XML file per sheet, styles, shared
+    strings, ...). Each part is stored once under objects/ by its sha256,
+    zlib-compressed; a backup is a small JSON manifest listing its parts.
+    Parts that did not change since the last run (untouched sheets, styles)
+    take no extra space. Manifests are named '<workbook>_<timestamp>' like
+    the old backup copies and can be restored to a full workbook.
+
+        root/
+          objects/ab/ab12...   zlib-compressed part
+          manifests/genai_rpa_20250101090000.json
+    """
+
+    def __init__(self, root, keep=BACKUP_KEEP, max_age_days=BACKUP_MAX_AGE_DAYS):
+        self.root = root
+        self.keep = keep
+        self.max_age_days = max_age_days
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _put_object(self, data):
+        """
+        Store one part if it is not stored yet. Returns (digest, new bytes written).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        _atomic_write(path, compressed)
+        return digest, len(compressed)
+
+    def backup(self, path, data=None, timestamp=None):
+        """
+        Back up the workbook at `path` (or its bytes `data`, read earlier).
+        Returns the backup id.
+        """
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        timestamp = timestamp or datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        name = os.path.splitext(os.path.basename(path))[0]
+        backup_id = f"{name}_{timestamp}"
+
+        parts, written = [], 0
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            for info in zf.infolist():
+                digest, size = self._put_object(zf.read(info))
+                written += size
+                parts.append({"name": info.filename, "sha256": digest,
+                              "date_time": list(info.date_time)})
+        manifest = {"id": backup_id, "workbook": name, "source": os.path.abspath(path),
+                    "created_at": timestamp, "size": len(data), "parts": parts}
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        _atomic_write(os.path.join(self.manifests_dir, f"{backup_id}.json"),
+                      json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+        print(f"Backup created: {backup_id} ({len(data)} bytes, {written} new bytes stored)")
+        self.prune(name)
+        return backup_id
+
+    def backup_async(self, path):
+        """
+        Read the workbook now and store it in the background, so a later
+        save to `path` cannot change what is backed up. Returns a Future.
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        return _executor.submit(self.backup, path, data, timestamp)
+
+    def list_backups(self, workbook=None):
+        """
+        Backup ids, oldest first, optionally only those of one workbook.
+        """
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        ids = sorted(os.path.splitext(name)[0] for name in os.listdir(self.manifests_dir)
+                     if name.endswith(".json"))
+        if workbook:
+            ids = [i for i in ids if i.rsplit("_", 1)[0] == workbook]
+        return ids
+
+    def load_manifest(self, backup_id):
+        with open(os.path.join(self.manifests_dir, f"{backup_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def restore(self, backup_id, dest):
+        """
+        Rebuild the workbook of `backup_id` at `dest`. Returns `dest`.
+        """
+        manifest = self.load_manifest(backup_id)
+        tmp_path = f"{dest}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            for part in manifest["parts"]:
+                with open(self._object_path(part["sha256"]), "rb") as f:
+                    data = zlib.decompress(f.read())
+                zf.writestr(zipfile.ZipInfo(part["name"], tuple(part["date_time"])), data,
+                            compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp_path, dest)
+        print(f"Backup {backup_id} restored to {dest}")
+        return dest
+
+    def prune(self, workbook=None):
+        """
+        Apply the retention policy (keep the newest `keep` backups per
+        workbook, drop those older than `max_age_days`) and delete parts
+        no manifest refers to. Returns the number of removed backups.
+        """
+        removed = 0
+        by_workbook = {}
+        for backup_id in self.list_backups(workbook):
+            by_workbook.setdefault(backup_id.rsplit("_", 1)[0], []).append(backup_id)
+        cutoff = None
+        if self.max_age_days:
+            cutoff = (datetime.datetime.now()
+                      - datetime.timedelta(days=self.max_age_days)).strftime('%Y%m%d%H%M%S')
+        for ids in by_workbook.values():
+            expired = ids[:-self.keep] if self.keep else []
+            if cutoff:
+                expired += [i for i in ids[-self.keep:] if i.rsplit("_", 1)[1] < cutoff]
+            for backup_id in expired:
+                os.remove(os.path.join(self.manifests_dir, f"{backup_id}.json"))
+                removed += 1
+        if removed:
+            self._collect_garbage()
+        return removed
+
+    def _collect_garbage(self):
+        referenced = set()
+        for backup_id in self.list_backups():
+            referenced.update(part["sha256"] for part in self.load_manifest(backup_id)["parts"])
+        now = time.time()
+        for folder, _, files in os.walk(self.objects_dir):
+            for name in files:
+                path = os.path.join(folder, name)
+                if name not in referenced and now - os.path.getmtime(path) > ORPHAN_GRACE_SECONDS:
+                    os.remove(path)
+
+    def stats(self):
+        """
+        Number of backups, stored object bytes and the sum of the original workbook sizes.
+        """
+        ids = self.list_backups()
+        stored = sum(os.path.getsize(os.path.join(folder, name))
+                     for folder, _, files in os.walk(self.objects_dir) for name in files)
+        original = sum(self.load_manifest(i)["size"] for i in ids)
+        return {"backups": len(ids), "stored_bytes": stored, "original_bytes": original}
+
+
+def wait_for_backups():
+    """
+    Block until the background backups submitted so far are written.
+    """
+    _executor.submit(lambda: None).result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List or restore workbook backups.")
+    parser.add_argument("root", help="backup folder (e.g. 06_analysis_openais/backups)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    list_parser = sub.add_parser("list")
+    list_parser.add_argument("workbook", nargs="?")
+    restore_parser = sub.add_parser("restore")
+    restore_parser.add_argument("backup_id")
+    restore_parser.add_argument("dest")
+    sub.add_parser("prune")
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.root)
+    if args.command == "list":
+        for backup_id in store.list_backups(args.workbook):
+            print(backup_id)
+        print(store.stats())
+    elif args.command == "restore":
+        store.restore(args.backup_id, args.dest)
+    else:
+        print(f"Removed {store.prune()} backups.")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
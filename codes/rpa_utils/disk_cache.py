@@ -0,0 +1,140 @@
+import os
+import time
+import sqlite3
+import threading
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "RPA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache"),
+)
+
+
+class DiskCache:
+    """
+    Persistent key/value cache stored in SQLite.
+
+    - every entry has an expiry time (TTL), expired entries are never returned
+    - the total stored size is bounded by `max_bytes`, least recently used
+      entries are evicted first
+    - safe to share between threads and between processes (SQLite locking)
+    """
+
+    def __init__(self, path, max_bytes=200 * 1024 * 1024, default_ttl=600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY, value INTEGER NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """
+        Return the cached bytes for `key`, or None if missing or expired.
+        """
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        with conn:
+            if row is not None:
+                conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._count(conn, "hits" if row is not None else "misses")
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    @staticmethod
+    def _count(conn, name):
+        conn.execute(
+            "INSERT INTO counters VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def set(self, key, value, ttl=None):
+        """
+        Store `value` (bytes or str) under `key` for `ttl` seconds.
+        """
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now + ttl, now),
+            )
+        self.evict()
+
+    def evict(self):
+        """
+        Drop expired entries, then least recently used ones until the
+        cache fits in `max_bytes`.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for key, size in conn.execute(
+                "SELECT key, size FROM cache ORDER BY accessed_at"
+            ).fetchall():
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache")
+
+    def stats(self):
+        """
+        Entry count and size, plus hit/miss counters for this process and
+        across every run sharing the cache file (total_hits/total_misses).
+        """
+        conn = self._connect()
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        totals = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+        }
@@ -0,0 +1,94 @@
+import os
+
+import openpyxl
+
+from rpa_utils import naver_parser, shopping_diff
+
+
+def dataframe_to_rows(dataframe, header=False):
+    """
+    Return the DataFrame as a list of row lists, the way they are stored in the sheet.
+    """
+    # typed columns may hold <NA>, which openpyxl cannot write
+    rows = dataframe.astype(object).where(dataframe.notna(), None).values.tolist()
+    if header:
+        rows.insert(0, [str(c) for c in dataframe.columns])
+    return rows
+
+
+def replace_sheet_rows(sheet, rows):
+    """
+    Replace the whole content of `sheet` with `rows` in one pass.
+
+    Instead of clearing every old cell and writing new ones one by one, the
+    sheet is dropped and recreated at the same position and the rows are
+    appended. Returns the new worksheet (the old object is detached).
+    """
+    wb = sheet.parent
+    title, index = sheet.title, wb.index(sheet)
+    was_active = wb.active is sheet
+    wb.remove(sheet)
+    new_sheet = wb.create_sheet(title=title, index=index)
+    if was_active:
+        wb.active = new_sheet
+    for row in rows:
+        new_sheet.append(row)
+    return new_sheet
+
+
+def write_dataframe(sheet, dataframe, header=False):
+    """
+    Replace the content of `sheet` with the DataFrame. Returns the new worksheet.
+    """
+    return replace_sheet_rows(sheet, dataframe_to_rows(dataframe, header=header))
+
+
+def save_atomic(wb, path):
+    """
+    Save an openpyxl workbook to a temp file next to `path` and rename it
+    over `path`, so a crash mid-save never leaves a truncated workbook and
+    readers only ever see a complete file.
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    tmp_path = os.path.join(folder, f".{name}.{os.getpid()}.tmp.xlsx")
+    try:
+        wb.save(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def iter_sheet_values(path, sheet_name):
+    """
+    Stream the rows of one sheet as tuples of cell values.
+
+    The workbook is opened read-only and values-only, so no Cell objects
+    are created and rows are parsed from the file as they are consumed.
+    Blank rows are skipped; a missing sheet yields nothing.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            return
+        for row in wb[sheet_name].iter_rows(values_only=True):
+            if any(value is not None for value in row):
+                yield row
+    finally:
+        wb.close()
+
+
+def read_sheet_rows(path, sheet_name):
+    """
+    All non-blank rows of a sheet as lists of values.
+    """
+    return [list(row) for row in iter_sheet_values(path, sheet_name)]
+
+
+def read_snapshot(path, sheet_name):
+    """
+    Read a prev_list/now_list sheet into a DataFrame with the Naver shopping
+    columns and the same dtypes as a freshly parsed API response.
+    """
+    df = shopping_diff.rows_to_dataframe(iter_sheet_values(path, sheet_name))
+    return naver_parser.apply_shop_dtypes(df)
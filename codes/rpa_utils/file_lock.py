@@ -0,0 +1,179 @@
+import os
+import time
+import threading
+
+from rpa_utils.stage_timer import percentile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Seconds to wait for another run to release a workbook before giving up
+WORKBOOK_LOCK_TIMEOUT = float(os.getenv("WORKBOOK_LOCK_TIMEOUT", "900"))
+
+_records = []
+_records_lock = threading.Lock()
+
+
+class LockTimeout(TimeoutError):
+    pass
+
+
+def _try_lock(fd):
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """
+    Exclusive inter-process lock on `<path>.lock`.
+
+    Two runs (processes, or threads with their own FileLock) that lock the
+    same path are serialized; the second waits up to `timeout` seconds and
+    then raises LockTimeout. Wait and hold times are recorded for
+    summary()/prometheus_text(). The OS releases the lock if a run crashes.
+    """
+
+    def __init__(self, path, timeout=WORKBOOK_LOCK_TIMEOUT, poll_interval=0.1):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+        self._acquired_at = None
+        self._wait = 0.0
+        self._contended = False
+
+    def acquire(self):
+        started = time.perf_counter()
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+        contended = False
+        while not _try_lock(fd):
+            contended = True
+            waited = time.perf_counter() - started
+            if self.timeout is not None and waited >= self.timeout:
+                os.close(fd)
+                _record(self.path, waited, 0.0, contended, timed_out=True)
+                raise LockTimeout(f"'{self.path}' is locked by another run (waited {waited:.1f}s)")
+            time.sleep(self.poll_interval)
+        self._fd = fd
+        self._acquired_at = time.perf_counter()
+        self._wait = self._acquired_at - started
+        self._contended = contended
+        if contended:
+            print(f"Lock acquired on {os.path.basename(self.path)} after {self._wait:.2f}s")
+        return self
+
+    def release(self):
+        if self._fd is None:
+            return
+        held = time.perf_counter() - self._acquired_at
+        _unlock(self._fd)
+        os.close(self._fd)
+        self._fd = None
+        _record(self.path, self._wait, held, self._contended, timed_out=False)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _record(path, wait, held, contended, timed_out):
+    with _records_lock:
+        _records.append({
+            "path": os.path.basename(path),
+            "wait": round(wait, 4),
+            "held": round(held, 4),
+            "contended": contended,
+            "timed_out": timed_out,
+        })
+
+
+def records():
+    with _records_lock:
+        return list(_records)
+
+
+def reset():
+    with _records_lock:
+        _records.clear()
+
+
+def summary():
+    """
+    Acquisitions, contended waits, timeouts and wait/hold time percentiles.
+    """
+    items = records()
+    waits = [r["wait"] for r in items]
+    held = [r["held"] for r in items if not r["timed_out"]]
+    return {
+        "acquisitions": sum(not r["timed_out"] for r in items),
+        "contended": sum(r["contended"] for r in items),
+        "timeouts": sum(r["timed_out"] for r in items),
+        "wait_p50": percentile(waits, 50),
+        "wait_p95": percentile(waits, 95),
+        "wait_max": max(waits, default=0.0),
+        "held_p50": percentile(held, 50),
+        "held_max": max(held, default=0.0),
+    }
+
+
+def prometheus_text():
+    """
+    Lock metrics in the Prometheus text exposition format.
+    """
+    s = summary()
+    waits = [r["wait"] for r in records()]
+    return "\n".join([
+        "# HELP rpa_workbook_lock_acquisitions_total Workbook locks acquired in this run.",
+        "# TYPE rpa_workbook_lock_acquisitions_total counter",
+        f"rpa_workbook_lock_acquisitions_total {s['acquisitions']}",
+        "# HELP rpa_workbook_lock_contended_total Acquisitions that had to wait for another run.",
+        "# TYPE rpa_workbook_lock_contended_total counter",
+        f"rpa_workbook_lock_contended_total {s['contended']}",
+        "# HELP rpa_workbook_lock_timeouts_total Lock waits that hit the timeout.",
+        "# TYPE rpa_workbook_lock_timeouts_total counter",
+        f"rpa_workbook_lock_timeouts_total {s['timeouts']}",
+        "# HELP rpa_workbook_lock_wait_seconds Time spent waiting for a workbook lock.",
+        "# TYPE rpa_workbook_lock_wait_seconds summary",
+        f'rpa_workbook_lock_wait_seconds{{quantile="0.5"}} {s["wait_p50"]}',
+        f'rpa_workbook_lock_wait_seconds{{quantile="0.95"}} {s["wait_p95"]}',
+        f"rpa_workbook_lock_wait_seconds_sum {sum(waits)}",
+        f"rpa_workbook_lock_wait_seconds_count {len(waits)}",
+    ]) + "\n"
+
+
+def export_lock_metrics(folder, prom_dir=None):
+    """
+    Write rpa_lock.prom to `prom_dir` (PROM_TEXTFILE_DIR, default `folder`).
+    """
+    if not records():
+        return None
+    prom_dir = prom_dir or os.getenv("PROM_TEXTFILE_DIR", folder)
+    os.makedirs(prom_dir, exist_ok=True)
+    prom_path = os.path.join(prom_dir, "rpa_lock.prom")
+    with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(prom_path + ".tmp", prom_path)
+    s = summary()
+    print(f"Workbook locks: {s['acquisitions']} (contended {s['contended']}, "
+          f"timeouts {s['timeouts']}, max wait {s['wait_max']:.2f}s)")
+    return prom_path
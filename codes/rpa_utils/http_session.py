@@ -0,0 +1,84 @@
+import queue
+import threading
+import http.client
+import urllib.parse
+
+
+class KeepAliveSession:
+    """
+    Small thread-safe keep-alive connection pool on top of http.client.
+
+    Connections are kept per (scheme, host, port) and reused across calls,
+    so repeated requests to the same API skip the TCP/TLS handshake.
+    """
+
+    def __init__(self, max_connections_per_host=10, timeout=10):
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize=self.max_connections_per_host)
+            return self._pools[key]
+
+    def _new_connection(self, scheme, host, port):
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def request(self, method, url, headers=None, body=None):
+        """
+        Send a request and return (status, headers, body bytes).
+        A stale pooled connection is retried once on a fresh connection.
+        """
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        key = (parts.scheme, parts.hostname, port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        pool = self._pool(key)
+        for attempt in range(2):
+            try:
+                conn = pool.get_nowait()
+            except queue.Empty:
+                conn = self._new_connection(*key)
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                conn.close()
+                if attempt == 1:
+                    raise
+                continue
+
+            if response.will_close:
+                conn.close()
+            else:
+                try:
+                    pool.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+            return response.status, dict(response.getheaders()), data
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def close(self):
+        """
+        Close every pooled connection.
+        """
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+
+# Shared session used by every Naver/OpenAPI helper in this package
+default_session = KeepAliveSession()
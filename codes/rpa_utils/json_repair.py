@@ -0,0 +1,77 @@
+import re
+import json
+
+_fence = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+
+def strip_code_fence(text):
+    """
+    Remove a surrounding ```json ... ``` fence, if any.
+    """
+    return _fence.sub("", text or "")
+
+
+def close_truncated_json(text):
+    """
+    Make a truncated JSON document parseable by cutting it back to the last
+    complete value and closing the open objects/arrays.
+    Returns the repaired text, or None if nothing complete was found.
+
+        '{"a": [1, 2, {"b": "unfinis'  ->  '{"a": [1, 2]}'
+    """
+    text = strip_code_fence(text)
+    stack = []          # open '{' / '['
+    in_string = escaped = False
+    cut = None          # (index after last complete value, stack snapshot)
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+                # a string value inside an array is complete here
+                if stack and stack[-1] == "[":
+                    cut = (i + 1, list(stack))
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            cut = (i + 1, list(stack))
+            if not stack:
+                return text[start:i + 1]
+        elif ch == "," and stack:
+            cut = (i, list(stack))
+
+    if cut is None:
+        return None
+    end, open_stack = cut
+    body = text[start:end].rstrip().rstrip(",")
+    closers = "".join("}" if c == "{" else "]" for c in reversed(open_stack))
+    return body + closers
+
+
+def loads_lenient(text):
+    """
+    json.loads that also accepts code fences and truncated documents.
+    Returns (data, repaired) or raises json.JSONDecodeError.
+    """
+    text = strip_code_fence(text)
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        repaired = close_truncated_json(text)
+        if repaired is None:
+            raise
+        return json.loads(repaired), True
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import datetime
+import threading
+from collections import defaultdict
+
+from rpa_utils.stage_timer import percentile
+
+# USD per 1M tokens (input, output). Unknown models are reported with cost 0.
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+# Batch API requests are billed at half price
+BATCH_DISCOUNT = 0.5
+
+_records = []
+_lock = threading.Lock()
+run_started_at = datetime.datetime.now()
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, mode="sync"):
+    """
+    Estimated cost in USD of one call.
+    """
+    pricing = next((p for name, p in sorted(MODEL_PRICING.items(), key=lambda x: -len(x[0]))
+                    if model and model.startswith(name)), (0.0, 0.0))
+    cost = (prompt_tokens * pricing[0] + completion_tokens * pricing[1]) / 1_000_000
+    return cost * BATCH_DISCOUNT if mode == "batch" else cost
+
+
+def record_call(model, latency, prompt_tokens=0, completion_tokens=0, cache="miss",
+                label=None, mode="sync", error=None, first_token_latency=None):
+    """
+    Record one LLM call. `cache` is 'hit', 'miss' or 'off'; `mode` is
+    'sync', 'stream' or 'batch'.
+    """
+    record = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "label": label or "unlabeled",
+        "model": model,
+        "mode": mode,
+        "cache": cache,
+        "latency": round(latency, 4),
+        "first_token_latency": None if first_token_latency is None else round(first_token_latency, 4),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": estimate_cost(model, prompt_tokens, completion_tokens, mode),
+        "error": error,
+    }
+    with _lock:
+        _records.append(record)
+    return record
+
+
+def usage_tokens(usage):
+    """
+    (prompt_tokens, completion_tokens) from an OpenAI usage object or dict.
+    """
+    if usage is None:
+        return 0, 0
+    if isinstance(usage, dict):
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+
+def metered_create(client, label=None, cache="off", **kwargs):
+    """
+    client.chat.completions.create with latency and token usage recorded.
+    """
+    started = time.perf_counter()
+    try:
+        completion = client.chat.completions.create(**kwargs)
+    except Exception as e:
+        record_call(kwargs.get("model"), time.perf_counter() - started, cache=cache,
+                    label=label, error=type(e).__name__)
+        raise
+    prompt_tokens, completion_tokens = usage_tokens(getattr(completion, "usage", None))
+    record_call(kwargs.get("model"), time.perf_counter() - started, prompt_tokens,
+                completion_tokens, cache=cache, label=label)
+    return completion
+
+
+def records():
+    with _lock:
+        return list(_records)
+
+
+def reset():
+    with _lock:
+        _records.clear()
+
+
+def _group(items, key):
+    groups = defaultdict(list)
+    for item in items:
+        groups[item[key]].append(item)
+    return groups
+
+
+def _aggregate(items):
+    latencies = [r["latency"] for r in items if r["cache"] != "hit"]
+    return {
+        "calls": len(items),
+        "cache_hits": sum(r["cache"] == "hit" for r in items),
+        "errors": sum(r["error"] is not None for r in items),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in items),
+        "completion_tokens": sum(r["completion_tokens"] for r in items),
+        "cost_usd": round(sum(r["cost_usd"] for r in items), 6),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "latency_max": max(latencies, default=0.0),
+    }
+
+
+def summary():
+    """
+    Totals for the run, plus breakdowns per label and per model,
+    labels sorted by cost.
+    """
+    items = records()
+    by_label = {label: _aggregate(group) for label, group in _group(items, "label").items()}
+    return {
+        "run_started_at": run_started_at.isoformat(timespec="seconds"),
+        "total": _aggregate(items),
+        "by_model": {model: _aggregate(group) for model, group in _group(items, "model").items()},
+        "by_label": dict(sorted(by_label.items(), key=lambda x: -x[1]["cost_usd"])),
+        "calls": items,
+    }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """
+    Render the run's metrics in the Prometheus text exposition format.
+    """
+    items = records()
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    groups = defaultdict(list)
+    for r in items:
+        groups[(r["model"], r["label"], r["cache"])].append(r)
+    metric("rpa_llm_calls_total", "counter", "LLM calls in this run.",
+           [({"model": m, "label": l, "cache": c}, len(g)) for (m, l, c), g in groups.items()])
+
+    groups = _group([dict(r, key=(r["model"], r["label"])) for r in items], "key")
+    metric("rpa_llm_prompt_tokens_total", "counter", "Prompt tokens used.",
+           [({"model": m, "label": l}, sum(r["prompt_tokens"] for r in g)) for (m, l), g in groups.items()])
+    metric("rpa_llm_completion_tokens_total", "counter", "Completion tokens used.",
+           [({"model": m, "label": l}, sum(r["completion_tokens"] for r in g)) for (m, l), g in groups.items()])
+    metric("rpa_llm_cost_usd_total", "counter", "Estimated LLM cost in USD.",
+           [({"model": m, "label": l}, round(sum(r["cost_usd"] for r in g), 6)) for (m, l), g in groups.items()])
+
+    samples = []
+    for (m, l), g in groups.items():
+        latencies = [r["latency"] for r in g]
+        for q in (0.5, 0.95):
+            samples.append(({"model": m, "label": l, "quantile": q}, percentile(latencies, q * 100)))
+    metric("rpa_llm_latency_seconds", "summary", "LLM call latency.", samples)
+    for (m, l), g in groups.items():
+        lines.append(f'rpa_llm_latency_seconds_sum{{model="{_escape(m)}",label="{_escape(l)}"}} '
+                     f'{sum(r["latency"] for r in g)}')
+        lines.append(f'rpa_llm_latency_seconds_count{{model="{_escape(m)}",label="{_escape(l)}"}} {len(g)}')
+    return "\n".join(lines) + "\n"
+
+
+def export_run_metrics(folder, prom_dir=None):
+    """
+    Write the per-run JSON summary to `folder` and the Prometheus textfile
+    to `prom_dir` (PROM_TEXTFILE_DIR, default `folder`). Returns both paths.
+    """
+    if not records():
+        return None, None
+    os.makedirs(folder, exist_ok=True)
+    timestamp = run_started_at.strftime('%Y%m%d%H%M%S')
+    json_path = os.path.join(folder, f"llm_run_{timestamp}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(summary(), f, ensure_ascii=False, indent=2)
+
+    prom_dir = prom_dir or os.getenv("PROM_TEXTFILE_DIR", folder)
+    os.makedirs(prom_dir, exist_ok=True)
+    prom_path = os.path.join(prom_dir, "rpa_llm.prom")
+    # write-then-rename so the node_exporter never reads a half written file
+    with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(prom_path + ".tmp", prom_path)
+
+    total = summary()["total"]
+    print(f"LLM calls: {total['calls']} (cache hits {total['cache_hits']}), "
+          f"tokens: {total['prompt_tokens']} + {total['completion_tokens']}, "
+          f"cost: ${total['cost_usd']:.4f}. Metrics: {json_path}")
+    return json_path, prom_path
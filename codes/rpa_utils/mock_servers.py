@@ -0,0 +1,344 @@
+import os
+import abc
+import json
+import time
+import email
+import email.policy
+import random
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def load_fixture(name):
+    """
+    Load a recorded payload from rpa_utils/fixtures.
+    """
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class MockServer(abc.ABC):
+    """
+    Base class for the local stand-in servers.
+
+    - latency: seconds added to every response (float or (min, max) tuple)
+    - error_rate: share of requests answered with `error_status` (0.0 ~ 1.0)
+
+    Use as a context manager; `base_url` points at the running server.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=429, port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _delay(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def _should_fail(self):
+        with self._lock:
+            self.request_count += 1
+        return random.random() < self.error_rate
+
+    @abc.abstractmethod
+    def handle(self, handler, method, path, query, body):
+        """
+        Return (status, payload dict). Implemented by subclasses.
+        """
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _dispatch(self, method):
+                parts = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(parts.query))
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                server._delay()
+                if server._should_fail():
+                    status, payload = server.error_status, {"errorMessage": "mock error"}
+                else:
+                    status, payload = server.handle(self, method, parts.path, query, body)
+                if payload is None:
+                    return  # handler already wrote the response
+                data = payload if isinstance(payload, bytes) else json.dumps(
+                    payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class MockNaverServer(MockServer):
+    """
+    Stand-in for https://openapi.naver.com/v1/search/{shop,news,...}.
+
+    Items are generated from the recorded fixtures, with productId and
+    lprice varied by query and start so pages and keywords differ.
+    Point the scripts at it with NAVER_API_BASE_URL=<base_url>.
+    """
+
+    def __init__(self, total=1000, **kwargs):
+        super().__init__(**kwargs)
+        self.total = total
+        self.fixtures = {
+            "shop": load_fixture("naver_shop.json"),
+            "news": load_fixture("naver_news.json"),
+        }
+
+    def handle(self, handler, method, path, query, body):
+        api_type = path.rstrip("/").rsplit("/", 1)[-1]
+        fixture = self.fixtures.get(api_type)
+        if fixture is None:
+            return 404, {"errorMessage": f"unknown api '{api_type}'"}
+
+        display = min(int(query.get("display", 10)), 100)
+        start = int(query.get("start", 1))
+        keyword = query.get("query", "")
+        seed = sum(keyword.encode("utf-8"))
+        count = max(0, min(display, self.total - start + 1))
+        templates = fixture["items"]
+        items = []
+        for i in range(count):
+            item = dict(templates[(start - 1 + i) % len(templates)])
+            rank = start + i
+            if "productId" in item:
+                item["productId"] = str(seed * 100000 + rank)
+                # small drift per call so consecutive snapshots differ
+                item["lprice"] = str(int(item["lprice"]) + random.choice((-500, 0, 0, 500)))
+            if "title" in item:
+                item["title"] = item["title"].replace("포켄스", keyword or "포켄스")
+            items.append(item)
+        return 200, {
+            "lastBuildDate": fixture["lastBuildDate"],
+            "total": self.total,
+            "start": start,
+            "display": len(items),
+            "items": items,
+        }
+
+
+class MockOpenAIServer(MockServer):
+    """
+    Stand-in for the OpenAI chat completions API (POST /v1/chat/completions)
+    and the Batch API (/v1/files, /v1/batches). Batches complete
+    `batch_delay` seconds after they are created.
+
+    `content` is the reply text, or a callable(request) returning the text
+    or (text, finish_reason) to script multi-turn scenarios.
+    Point the OpenAI client at it with OPENAI_BASE_URL=<base_url>/v1.
+    """
+
+    def __init__(self, content=None, batch_delay=0.0, token_delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.content = content or load_fixture("openai_chat.json")["content"]
+        self.batch_delay = batch_delay
+        # delay between streamed chunks (stream=True requests)
+        self.token_delay = token_delay
+        self.files = {}
+        self.batches = {}
+
+    def reply(self, request):
+        """
+        (text, finish_reason) for a chat request.
+        """
+        if not callable(self.content):
+            return self.content, "stop"
+        result = self.content(request)
+        return result if isinstance(result, tuple) else (result, "stop")
+
+    def chat_completion(self, request):
+        content, finish_reason = self.reply(request)
+        prompt_tokens = sum(len(m.get("content") or "") for m in request.get("messages", [])) // 2
+        completion_tokens = len(content) // 2
+        return {
+            "id": f"chatcmpl-mock-{self.request_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def stream_chat_completion(self, handler, request, chunk_size=5):
+        """
+        Write the completion as server-sent events, one chunk every `token_delay` seconds.
+        """
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        base = {
+            "id": f"chatcmpl-mock-{self.request_count}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+        }
+        content, finish_reason = self.reply(request)
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        try:
+            for i, piece in enumerate(pieces):
+                delta = {"content": piece} if i else {"role": "assistant", "content": piece}
+                chunk = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+                handler.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                handler.wfile.flush()
+                if self.token_delay:
+                    time.sleep(self.token_delay)
+            chunk = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": finish_reason}])
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            if (request.get("stream_options") or {}).get("include_usage"):
+                usage = self.chat_completion(request)["usage"]
+                chunk = dict(base, choices=[], usage=usage)
+                handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client stopped reading (e.g. timeout)
+        return None
+
+    def _store_file(self, data, filename, purpose):
+        file_id = f"file-mock-{len(self.files) + 1}"
+        self.files[file_id] = {
+            "data": data,
+            "meta": {
+                "id": file_id, "object": "file", "bytes": len(data),
+                "created_at": int(time.time()), "filename": filename,
+                "purpose": purpose, "status": "processed",
+            },
+        }
+        return self.files[file_id]["meta"]
+
+    def _upload(self, handler, body):
+        message = email.message_from_bytes(
+            b"Content-Type: " + handler.headers["Content-Type"].encode() + b"\r\n\r\n" + body,
+            policy=email.policy.HTTP,
+        )
+        fields, data, filename = {}, b"", "upload.jsonl"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                data = part.get_payload(decode=True)
+                filename = part.get_filename() or filename
+            else:
+                fields[name] = part.get_content().strip()
+        return self._store_file(data, filename, fields.get("purpose", "batch"))
+
+    def _create_batch(self, request):
+        batch_id = f"batch-mock-{len(self.batches) + 1}"
+        lines = self.files[request["input_file_id"]]["data"].decode("utf-8").splitlines()
+        output = []
+        for line in filter(None, lines):
+            item = json.loads(line)
+            output.append(json.dumps({
+                "id": f"batch_req_{len(output) + 1}",
+                "custom_id": item["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": f"req_{len(output) + 1}",
+                    "body": self.chat_completion(item["body"]),
+                },
+                "error": None,
+            }, ensure_ascii=False))
+        output_file = self._store_file("\n".join(output).encode("utf-8"),
+                                       f"{batch_id}_output.jsonl", "batch_output")
+        self.batches[batch_id] = {
+            "ready_at": time.time() + self.batch_delay,
+            "output_file_id": output_file["id"],
+            "meta": {
+                "id": batch_id, "object": "batch", "endpoint": request["endpoint"],
+                "input_file_id": request["input_file_id"],
+                "completion_window": request["completion_window"],
+                "created_at": int(time.time()), "metadata": request.get("metadata"),
+                "errors": None, "error_file_id": None,
+                "request_counts": {"total": len(output), "completed": 0, "failed": 0},
+            },
+        }
+        return self._batch_status(batch_id)
+
+    def _batch_status(self, batch_id):
+        batch = self.batches[batch_id]
+        meta = dict(batch["meta"])
+        if time.time() >= batch["ready_at"]:
+            meta["status"] = "completed"
+            meta["output_file_id"] = batch["output_file_id"]
+            meta["request_counts"] = dict(meta["request_counts"], completed=meta["request_counts"]["total"])
+        else:
+            meta["status"] = "in_progress"
+            meta["output_file_id"] = None
+        return meta
+
+    def handle(self, handler, method, path, query, body):
+        if method == "POST" and path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            if request.get("stream"):
+                return 200, self.stream_chat_completion(handler, request)
+            return 200, self.chat_completion(request)
+        if method == "POST" and path.endswith("/files"):
+            return 200, self._upload(handler, body)
+        if method == "GET" and path.endswith("/content"):
+            file_id = path.rstrip("/").split("/")[-2]
+            if file_id in self.files:
+                return 200, self.files[file_id]["data"]
+        if method == "POST" and path.endswith("/batches"):
+            return 200, self._create_batch(json.loads(body or b"{}"))
+        if method == "GET" and "/batches/" in path:
+            batch_id = path.rstrip("/").split("/")[-1]
+            if batch_id in self.batches:
+                return 200, self._batch_status(batch_id)
+        return 404, {"error": {"message": f"unknown endpoint {method} {path}"}}
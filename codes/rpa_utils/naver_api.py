@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import asyncio
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from rpa_utils import naver_parser
+from rpa_utils.disk_cache import DEFAULT_CACHE_DIR, DiskCache
+from rpa_utils.http_session import default_session
+from rpa_utils.rate_limiter import QuotaExceededError, backoff_delay, naver_rate_limiter
+
+# .env 파일 로드
+load_dotenv()
+
+# NAVER_API_BASE_URL lets the scripts run against rpa_utils.mock_servers.MockNaverServer
+NAVER_API_BASE_URL = os.getenv("NAVER_API_BASE_URL", "https://openapi.naver.com")
+NAVER_SEARCH_URL = NAVER_API_BASE_URL.rstrip("/") + "/v1/search/{api_type}"
+DEFAULT_MAX_CONCURRENCY = 10
+# Naver search limits: display <= 100, start <= 1000
+NAVER_MAX_DISPLAY = 100
+NAVER_MAX_START = 1000
+# 429 / 5xx / connection errors are retried with exponential backoff
+NAVER_MAX_RETRIES = int(os.getenv("NAVER_MAX_RETRIES", "5"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Response cache TTL (seconds) per endpoint. Set NAVER_CACHE_BYPASS=1 to skip the cache.
+NAVER_CACHE_TTL = {
+    "shop": int(os.getenv("NAVER_CACHE_TTL_SHOP", "600")),
+    "news": int(os.getenv("NAVER_CACHE_TTL_NEWS", "1800")),
+    "image": int(os.getenv("NAVER_CACHE_TTL_IMAGE", "3600")),
+}
+NAVER_CACHE_BYPASS = os.getenv("NAVER_CACHE_BYPASS", "0") == "1"
+naver_cache = DiskCache(
+    os.path.join(DEFAULT_CACHE_DIR, "naver_responses.sqlite"),
+    max_bytes=int(os.getenv("NAVER_CACHE_MAX_MB", "100")) * 1024 * 1024,
+    default_ttl=600,
+)
+
+
+def build_naver_url(api_type, query, sort="date", display=20, start=1):
+    """
+    Build the Naver search API url for the given api type and query.
+    """
+    params = urllib.parse.urlencode({
+        "sort": sort,
+        "display": display,
+        "start": start,
+        "query": query,
+    })
+    return f"{NAVER_SEARCH_URL.format(api_type=api_type)}?{params}"
+
+
+def fetch_naver_api_data(api_type, query, sort="date", display=20, start=1, use_cache=None):
+    """
+    Fetch data from Naver API (shop, news, image ...) for a single query
+    over the shared keep-alive session. Returns the decoded JSON text, or None on error.
+
+    Successful responses are cached on disk for NAVER_CACHE_TTL[api_type]
+    seconds. `use_cache=False` (or NAVER_CACHE_BYPASS=1) always calls the API.
+    Calls are throttled by the shared rate limiter and 429/5xx responses
+    are retried with exponential backoff. Once the daily quota is used up
+    the call is skipped and returns None like any other error.
+    """
+    if use_cache is None:
+        use_cache = not NAVER_CACHE_BYPASS
+    url = build_naver_url(api_type, query, sort=sort, display=display, start=start)
+    if use_cache:
+        cached = naver_cache.get(url)
+        if cached is not None:
+            return cached.decode('utf-8')
+
+    headers = {
+        "X-Naver-Client-Id": os.getenv("NAVER_CLIENT_ID", ""),
+        "X-Naver-Client-Secret": os.getenv("NAVER_CLIENT_SECRET", ""),
+    }
+    for attempt in range(NAVER_MAX_RETRIES + 1):
+        try:
+            naver_rate_limiter.acquire("naver")
+        except QuotaExceededError as e:
+            print(f"Request skipped: {e} ({api_type}, {query})")
+            return None
+        try:
+            status, _, body = default_session.get(url, headers=headers)
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == NAVER_MAX_RETRIES:
+                print(f"Request failed: {e} ({api_type}, {query})")
+                return None
+            time.sleep(backoff_delay(attempt))
+            continue
+        if status not in RETRY_STATUS_CODES or attempt == NAVER_MAX_RETRIES:
+            break
+        print(f"Error Code: {status} ({api_type}, {query}), retry {attempt + 1}/{NAVER_MAX_RETRIES}")
+        time.sleep(backoff_delay(attempt))
+
+    if status == 200:
+        if use_cache:
+            naver_cache.set(url, body, ttl=NAVER_CACHE_TTL.get(api_type, naver_cache.default_ttl))
+        return body.decode('utf-8')
+    print(f"Error Code: {status} ({api_type}, {query})")
+    return None
+
+
+async def fetch_keywords_async(keywords, api_types=("shop", "news"),
+                               max_concurrency=DEFAULT_MAX_CONCURRENCY, **params):
+    """
+    Fetch every (keyword, api_type) pair concurrently, at most
+    `max_concurrency` requests in flight at once.
+    Returns a dict keyed by (keyword, api_type).
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    pairs = [(keyword, api_type) for keyword in keywords for api_type in api_types]
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        async def fetch_one(keyword, api_type):
+            async with semaphore:
+                return await loop.run_in_executor(
+                    executor,
+                    lambda: fetch_naver_api_data(api_type, keyword, **params),
+                )
+
+        results = await asyncio.gather(
+            *(fetch_one(keyword, api_type) for keyword, api_type in pairs),
+            return_exceptions=True,
+        )
+
+    fetched = {}
+    for pair, result in zip(pairs, results):
+        if isinstance(result, Exception):
+            print(f"Fetch failed for {pair}: {result}")
+            result = None
+        fetched[pair] = result
+    return fetched
+
+
+def fetch_keywords(keywords, api_types=("shop", "news"),
+                   max_concurrency=DEFAULT_MAX_CONCURRENCY, **params):
+    """
+    Synchronous wrapper around fetch_keywords_async for the RPA scripts.
+    """
+    return asyncio.run(fetch_keywords_async(
+        keywords, api_types=api_types, max_concurrency=max_concurrency, **params
+    ))
+
+
+def page_starts(total, display=NAVER_MAX_DISPLAY, max_items=NAVER_MAX_START):
+    """
+    Return the `start` values needed to page through `total` results.
+    """
+    limit = min(total, max_items, NAVER_MAX_START + display - 1)
+    return [start for start in range(1, limit + 1, display) if start <= NAVER_MAX_START]
+
+
+def iter_naver_page_texts(api_type, query, display=NAVER_MAX_DISPLAY, max_items=NAVER_MAX_START,
+                          max_concurrency=DEFAULT_MAX_CONCURRENCY, **params):
+    """
+    Page through the Naver search results in parallel and yield each raw
+    response text, in `start` order.
+
+    The first page is fetched alone to learn `total`; the remaining pages
+    are requested concurrently and yielded as soon as the next page in
+    order is ready, so only a few pages are held in memory at once.
+    """
+    first = fetch_naver_api_data(api_type, query, display=display, start=1, **params)
+    if first is None:
+        return
+    total = naver_parser.read_total(first)
+    yield first
+    del first
+
+    starts = page_starts(total, display=display, max_items=max_items)[1:]
+    if not starts:
+        return
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(fetch_naver_api_data, api_type, query,
+                            display=display, start=start, **params)
+            for start in starts
+        ]
+        for start, future in zip(starts, futures):
+            body = future.result()
+            if body is None:
+                print(f"Page start={start} skipped ({api_type}, {query})")
+                continue
+            yield body
+
+
+def fetch_naver_page_texts(api_type, query, display=NAVER_MAX_DISPLAY, max_items=NAVER_MAX_START,
+                           max_concurrency=DEFAULT_MAX_CONCURRENCY, **params):
+    """
+    All result pages as a list of raw response texts, in `start` order.
+
+    Unlike iter_naver_page_texts, a pull is all or nothing: returns None if
+    any page could not be fetched, so a partial result is never taken for
+    the complete one.
+    """
+    first = fetch_naver_api_data(api_type, query, display=display, start=1, **params)
+    if first is None:
+        return None
+    starts = page_starts(naver_parser.read_total(first), display=display, max_items=max_items)[1:]
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        bodies = list(executor.map(
+            lambda start: fetch_naver_api_data(api_type, query, display=display, start=start, **params),
+            starts,
+        ))
+    missing = sum(body is None for body in bodies)
+    if missing:
+        print(f"{missing} of {len(starts) + 1} pages failed ({api_type}, {query}), result dropped")
+        return None
+    return [first] + bodies
+
+
+def iter_naver_pages(api_type, query, **kwargs):
+    """
+    Same as iter_naver_page_texts, but yields each page as a parsed dict.
+    """
+    for body in iter_naver_page_texts(api_type, query, **kwargs):
+        page = json.loads(body)
+        if not page.get("items"):
+            break
+        yield page
+
+
+def iter_naver_page_frames(api_type, query, **kwargs):
+    """
+    Same as iter_naver_page_texts, but yields each page as a typed DataFrame
+    built straight from the response text (see rpa_utils.naver_parser).
+    """
+    for df in naver_parser.iter_page_dataframes(iter_naver_page_texts(api_type, query, **kwargs)):
+        if df.empty:
+            break
+        yield df
@@ -0,0 +1,127 @@
+import re
+import json
+
+import pandas as pd
+
+# Column dtypes for Naver shopping items
+SHOP_INT_COLUMNS = ("lprice", "hprice", "productId", "productType")
+SHOP_CATEGORY_COLUMNS = ("mallName", "brand", "maker",
+                         "category1", "category2", "category3", "category4")
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"[\s,]*")
+_items_start = re.compile(r'"items"\s*:\s*\[')
+_total = re.compile(r'"total"\s*:\s*(\d+)')
+
+
+def read_total(text):
+    """
+    Read the 'total' field from a Naver search response without parsing it.
+    """
+    match = _total.search(text)
+    return int(match.group(1)) if match else 0
+
+
+def iter_items(text):
+    """
+    Yield the objects of the 'items' array one by one from the raw response
+    text, without building the full response dict.
+    """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    match = _items_start.search(text)
+    if match is None:
+        return
+    pos = match.end()
+    while True:
+        pos = _whitespace.match(text, pos).end()
+        if pos >= len(text) or text[pos] == "]":
+            return
+        item, pos = _decoder.raw_decode(text, pos)
+        yield item
+
+
+def parse_items_to_columns(text):
+    """
+    Decode the 'items' array straight into per-column lists.
+    """
+    columns = {}
+    count = 0
+    for item in iter_items(text):
+        for key, value in item.items():
+            column = columns.get(key)
+            if column is None:
+                # a field first seen here is missing in every earlier item
+                column = columns[key] = [None] * count
+            column.append(value)
+        count += 1
+        for column in columns.values():
+            if len(column) < count:
+                column.append(None)
+    return columns, count
+
+
+def columns_to_dataframe(columns, count, start_rank=1):
+    """
+    Build a typed DataFrame from parsed columns, indexed by '순위'.
+    """
+    data = {}
+    for key, values in columns.items():
+        if key in SHOP_INT_COLUMNS:
+            # "" (e.g. hprice without a range) becomes <NA>
+            data[key] = pd.to_numeric(pd.Series(values, dtype="object"),
+                                      errors="coerce").astype("Int64")
+        elif key in SHOP_CATEGORY_COLUMNS:
+            data[key] = pd.Categorical(values)
+        else:
+            data[key] = values
+    df = pd.DataFrame(data)
+    df.index = pd.RangeIndex(start_rank, start_rank + count, name="순위")
+    return df
+
+
+def apply_shop_dtypes(df):
+    """
+    Give a shopping DataFrame read from elsewhere (e.g. a sheet) the same
+    dtypes as the parsed API responses.
+    """
+    for key in df.columns:
+        if key in SHOP_INT_COLUMNS:
+            df[key] = pd.to_numeric(df[key], errors="coerce").astype("Int64")
+        elif key in SHOP_CATEGORY_COLUMNS:
+            df[key] = df[key].astype("category")
+    return df
+
+
+def page_to_dataframe(text, start_rank=1):
+    """
+    Convert one Naver response (str or bytes) to a typed DataFrame.
+    """
+    columns, count = parse_items_to_columns(text)
+    return columns_to_dataframe(columns, count, start_rank=start_rank)
+
+
+def iter_page_dataframes(pages):
+    """
+    Yield one typed DataFrame per response text, with '순위' continuing
+    across pages.
+    """
+    rank = 1
+    for text in pages:
+        df = page_to_dataframe(text, start_rank=rank)
+        rank += len(df)
+        yield df
+
+
+def concat_pages(frames):
+    """
+    Concatenate page DataFrames, keeping category dtypes where possible.
+    """
+    frames = list(frames)
+    if not frames:
+        return pd.DataFrame(index=pd.RangeIndex(1, 1, name="순위"))
+    df = pd.concat(frames)
+    for key in SHOP_CATEGORY_COLUMNS:
+        if key in df.columns and df[key].dtype != "category":
+            df[key] = df[key].astype("category")
+    return df
@@ -0,0 +1,134 @@
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+# Prompt budget for article text in a single LLM call (estimated tokens)
+DEFAULT_TOKEN_BUDGET = 6000
+
+_tags = re.compile(r"<[^>]+>")
+_entities = {"&quot;": '"', "&amp;": "&", "&lt;": "<", "&gt;": ">", "&apos;": "'"}
+
+
+def estimate_tokens(text):
+    """
+    Rough token estimate without a tokenizer: about 4 ASCII characters per
+    token, and one token per non-ASCII (e.g. Korean) character.
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _clean(text):
+    text = _tags.sub("", text or "")
+    for entity, char in _entities.items():
+        text = text.replace(entity, char)
+    return text.strip()
+
+
+def parse_articles(pages):
+    """
+    Extract (title, description, pubDate) of every article from one Naver
+    news response (str/dict) or an iterable of them, without tags.
+    """
+    if isinstance(pages, (str, bytes, dict)):
+        pages = [pages]
+    articles = []
+    for page in pages:
+        if isinstance(page, (str, bytes)):
+            page = json.loads(page)
+        for item in page.get("items", []):
+            articles.append({
+                "title": _clean(item.get("title")),
+                "description": _clean(item.get("description")),
+                "pubDate": item.get("pubDate", ""),
+            })
+    return articles
+
+
+def format_articles(articles):
+    """
+    One compact line per article for the prompt.
+    """
+    return "\n".join(
+        f"- [{a['pubDate'][:16]}] {a['title']}: {a['description']}" for a in articles
+    )
+
+
+def chunk_by_budget(lines, token_budget):
+    """
+    Group text lines greedily so each group stays within `token_budget`.
+    """
+    chunks, current, used = [], [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if current and used + tokens > token_budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(line)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def map_prompt(text):
+    return f"""
+    너는 뉴스 요약 전문가야.
+    다음 뉴스 기사 묶음의 핵심 내용을 5줄 이내로 요약해주세요.
+    구체적인 수치, 고유명사, 키워드는 그대로 남겨주세요.
+
+    뉴스 기사:
+    {text}
+    """
+
+
+def final_prompt(text):
+    return f"""
+    너는 뉴스 요약 전문가야.
+    다음 뉴스 내용을 요약해주세요:
+
+    뉴스 내용: {text}
+
+    요약 요구사항:
+    1. 주요 뉴스 주제 및 핵심 메시지 요약
+    2. 구체적인 수치, 고유명사, 키워드 포함
+    3. 소비자에게 유용한 인사이트 제공
+
+    결과물 요청사항:
+    - 한글로 작성, 총 300-400자 이내로 간결하게 작성
+    - 글머리를 활용하여 명확하고 간결한 요약 작성
+    - 마크다운, HTML 태그, 특수기호 사용 금지
+    """
+
+
+def summarize_news(pages, complete, build_final_prompt=final_prompt,
+                   token_budget=DEFAULT_TOKEN_BUDGET, max_workers=4):
+    """
+    Map-reduce summary of Naver news results.
+
+    `complete(prompt, step)` sends one prompt to the LLM and returns the
+    text; `step` is 'final', 'map-<n>' or 'reduce<level>-<n>'. When all
+    articles fit in `token_budget` this is a single call. Otherwise article
+    chunks are summarized in parallel and the partial summaries are reduced
+    until they fit into the final prompt.
+    """
+    lines = format_articles(parse_articles(pages)).splitlines()
+    if not lines:
+        return None
+
+    level = 0
+    while estimate_tokens("\n".join(lines)) > token_budget:
+        chunks = chunk_by_budget(lines, token_budget)
+        step = "map" if level == 0 else f"reduce{level}"
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            partials = list(executor.map(
+                lambda args: complete(map_prompt("\n".join(args[1])), f"{step}-{args[0]}"),
+                enumerate(chunks),
+            ))
+        print(f"News {step}: {len(lines)} lines -> {len(chunks)} partial summaries")
+        lines = [p for p in partials if p]
+        level += 1
+        if len(chunks) == 1:
+            break
+
+    return complete(build_final_prompt("\n".join(lines)), "final")
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+
+import httpx
+import openai
+
+from dotenv import load_dotenv
+
+from rpa_utils import llm_metrics
+from rpa_utils.disk_cache import DEFAULT_CACHE_DIR, DiskCache
+
+# .env 파일 로드
+load_dotenv()
+
+# Identical (model, messages, parameters) requests are answered from this cache.
+# OPENAI_CACHE_BYPASS=1 always calls the API.
+OPENAI_CACHE_BYPASS = os.getenv("OPENAI_CACHE_BYPASS", "0") == "1"
+OPENAI_CACHE_MAX_AGE = int(os.getenv("OPENAI_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+openai_cache = DiskCache(
+    os.path.join(DEFAULT_CACHE_DIR, "openai_responses.sqlite"),
+    max_bytes=int(os.getenv("OPENAI_CACHE_MAX_MB", "50")) * 1024 * 1024,
+    default_ttl=OPENAI_CACHE_MAX_AGE,
+)
+
+
+def cache_key(model, messages, **params):
+    """
+    Content address of a chat completion request: sha256 over the
+    canonical JSON of model, messages and parameters.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chat_completion(client, model, messages, use_cache=None, label=None, **params):
+    """
+    Call client.chat.completions.create and return the message content.
+    Byte-identical requests are served from the SQLite cache (LRU + max age).
+    Every call is recorded in llm_metrics under `label`.
+    """
+    if use_cache is None:
+        use_cache = not OPENAI_CACHE_BYPASS
+    key = cache_key(model, messages, **params)
+    if use_cache:
+        started = time.perf_counter()
+        cached = openai_cache.get(key)
+        if cached is not None:
+            llm_metrics.record_call(model, time.perf_counter() - started, cache="hit", label=label)
+            return cached.decode("utf-8")
+
+    completion = llm_metrics.metered_create(
+        client, label=label, cache="miss" if use_cache else "off",
+        model=model, messages=messages, **params
+    )
+    content = completion.choices[0].message.content
+    if use_cache and content is not None:
+        openai_cache.set(key, content)
+    return content
+
+
+def stream_chat_completion(client, model, messages, on_checkpoint=None, checkpoint_interval=2.0,
+                           timeout=None, use_cache=None, label=None, **params):
+    """
+    Stream a chat completion and return the text received.
+
+    - prints progress and the time to first token
+    - calls on_checkpoint(partial_text) at most every `checkpoint_interval` seconds
+    - stops after `timeout` seconds (total), keeping the text received so far;
+      a stream that stalls longer than `timeout` between chunks, or whose
+      connection drops, also returns the partial text (recorded as an error)
+
+    Only complete responses are stored in the cache.
+    """
+    if use_cache is None:
+        use_cache = not OPENAI_CACHE_BYPASS
+    key = cache_key(model, messages, **params)
+    started = time.perf_counter()
+    if use_cache:
+        cached = openai_cache.get(key)
+        if cached is not None:
+            llm_metrics.record_call(model, time.perf_counter() - started, cache="hit",
+                                    label=label, mode="stream")
+            return cached.decode("utf-8")
+
+    last_checkpoint = started
+    first_token_at = None
+    parts = []
+    finished = False
+    usage = None
+    error = None
+    try:
+        stream = client.chat.completions.create(
+            model=model, messages=messages, stream=True,
+            stream_options={"include_usage": True}, timeout=timeout, **params
+        )
+    except Exception as e:
+        llm_metrics.record_call(model, time.perf_counter() - started, label=label,
+                                mode="stream", error=type(e).__name__)
+        raise
+    try:
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta and choice.delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    print(f"First token after {first_token_at - started:.2f}s")
+                parts.append(choice.delta.content)
+            if choice.finish_reason is not None:
+                finished = True
+
+            now = time.perf_counter()
+            if on_checkpoint is not None and now - last_checkpoint >= checkpoint_interval:
+                on_checkpoint("".join(parts))
+                last_checkpoint = now
+                print(f"Streaming... {sum(len(p) for p in parts)} chars, {now - started:.1f}s")
+            if timeout is not None and now - started > timeout:
+                print(f"Streaming stopped after {timeout}s, keeping partial text.")
+                break
+    except (openai.APITimeoutError, httpx.TimeoutException):
+        # `timeout` is also the read timeout between chunks
+        error = "timeout"
+        print(f"Streaming timed out after {time.perf_counter() - started:.1f}s, keeping partial text.")
+    except (openai.APIConnectionError, httpx.TransportError) as e:
+        error = type(e).__name__
+        print(f"Streaming interrupted ({error}) after {time.perf_counter() - started:.1f}s, "
+              f"keeping partial text.")
+    finally:
+        stream.close()
+
+    text = "".join(parts)
+    elapsed = time.perf_counter() - started
+    print(f"Streaming done: {len(text)} chars in {elapsed:.2f}s")
+    prompt_tokens, completion_tokens = llm_metrics.usage_tokens(usage)
+    llm_metrics.record_call(
+        model, elapsed, prompt_tokens, completion_tokens,
+        cache="miss" if use_cache else "off", label=label, mode="stream",
+        first_token_latency=None if first_token_at is None else first_token_at - started,
+        error=error or (None if finished else "incomplete"),
+    )
+    if use_cache and finished:
+        openai_cache.set(key, text)
+    return text
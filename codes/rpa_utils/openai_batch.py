@@ -0,0 +1,109 @@
+import os
+import json
+import time
+
+from rpa_utils import llm_metrics
+
+# Batch statuses after which the job will not change any more
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def build_batch_request(custom_id, model, messages, **params):
+    """
+    One line of a Batch API input file for /v1/chat/completions.
+    """
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {"model": model, "messages": messages, **params},
+    }
+
+
+def write_batch_file(requests, path):
+    """
+    Write batch requests as JSONL and return the path.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for request in requests:
+            f.write(json.dumps(request, ensure_ascii=False) + "\n")
+    return path
+
+
+def submit_batch(client, path, completion_window="24h", metadata=None):
+    """
+    Upload the JSONL file and create the batch job.
+    """
+    with open(path, "rb") as f:
+        batch_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window=completion_window,
+        metadata=metadata,
+    )
+    print(f"Batch submitted: {batch.id} ({path})")
+    return batch
+
+
+def wait_for_batch(client, batch_id, poll_interval=60, timeout=None):
+    """
+    Poll the batch until it reaches a final status (or `timeout` seconds pass).
+    """
+    started = time.time()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"Batch {batch_id}: {batch.status} "
+                  f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+        if batch.status in FINAL_STATUSES:
+            return batch
+        if timeout is not None and time.time() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} still '{batch.status}' after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def read_batch_results(client, batch, elapsed=0.0):
+    """
+    Download the output file and return {custom_id: message content}.
+    Failed requests map to None. Usage of every request is recorded in
+    llm_metrics (mode 'batch', latency = `elapsed` batch turnaround).
+    """
+    results = {}
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            prompt_tokens, completion_tokens = llm_metrics.usage_tokens(body.get("usage"))
+            ok = response.get("status_code") == 200
+            llm_metrics.record_call(
+                body.get("model"), elapsed, prompt_tokens, completion_tokens, cache="off",
+                label=record["custom_id"], mode="batch",
+                error=None if ok else str(response.get("status_code")),
+            )
+            results[record["custom_id"]] = body["choices"][0]["message"]["content"] if ok else None
+    if batch.error_file_id:
+        for line in client.files.content(batch.error_file_id).text.splitlines():
+            if line.strip():
+                record = json.loads(line)
+                print(f"Batch request failed: {record.get('custom_id')} {record.get('error')}")
+                results.setdefault(record["custom_id"], None)
+    return results
+
+
+def run_batch(client, requests, path, poll_interval=60, timeout=None):
+    """
+    Write, submit and wait for a batch, then return {custom_id: content}.
+    """
+    write_batch_file(requests, path)
+    started = time.perf_counter()
+    batch = submit_batch(client, path)
+    batch = wait_for_batch(client, batch.id, poll_interval=poll_interval, timeout=timeout)
+    if batch.status != "completed":
+        print(f"Batch {batch.id} ended with status '{batch.status}'.")
+    return read_batch_results(client, batch, elapsed=time.perf_counter() - started)
@@ -0,0 +1,223 @@
+import os
+import sqlite3
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from rpa_utils import shopping_diff
+from rpa_utils.snapshot_store import DEFAULT_SNAPSHOT_PATH
+
+# Number of past prices per product used for the rolling statistics
+PRICE_WINDOW = int(os.getenv("PRICE_WINDOW", "10"))
+# A new price is flagged when it moved PRICE_PCT % since the last fetch, or when its
+# z-score against the window reaches PRICE_ZSCORE (needs PRICE_MIN_POINTS past prices)
+# and it moved at least PRICE_MIN_PCT %, so tiny moves of very stable prices are ignored
+PRICE_ZSCORE = float(os.getenv("PRICE_ZSCORE", "3"))
+PRICE_PCT = float(os.getenv("PRICE_PCT", "30"))
+PRICE_MIN_PCT = float(os.getenv("PRICE_MIN_PCT", "5"))
+PRICE_MIN_POINTS = int(os.getenv("PRICE_MIN_POINTS", "3"))
+
+STAT_COLUMNS = [
+    "productId", "title", "mallName", "lprice", "prev_price", "pct_change",
+    "window_mean", "window_std", "zscore", "window_min", "window_max",
+    "low", "high", "observations", "anomaly",
+]
+
+
+class PriceIndex:
+    """
+    Per-product price index over all shopping fetches of a keyword.
+
+    For every (keyword, productId) the index keeps the last `window` prices
+    as a fixed-size float64 blob, the all-time low/high and the number of
+    observations. update() reads and writes only the rows of the products in
+    the new fetch, so it costs O(new rows) however long the history is, and
+    the statistics are computed on one (products x window) NumPy array.
+    A fetch is applied at most once per product (by taken_at), so replaying
+    snapshots with backfill() is safe.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, window=PRICE_WINDOW, zscore=PRICE_ZSCORE,
+                 pct=PRICE_PCT, min_pct=PRICE_MIN_PCT, min_points=PRICE_MIN_POINTS):
+        self.path = path
+        self.window = window
+        self.zscore = zscore
+        self.pct = pct
+        self.min_pct = min_pct
+        self.min_points = min_points
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS price_index (
+                    keyword TEXT NOT NULL,
+                    productId INTEGER NOT NULL,
+                    observations INTEGER NOT NULL,
+                    low INTEGER,
+                    high INTEGER,
+                    last_taken_at TEXT NOT NULL,
+                    prices BLOB NOT NULL,
+                    PRIMARY KEY (keyword, productId)
+                )
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS update_ids (productId INTEGER PRIMARY KEY)")
+            self._local.conn = conn
+        return conn
+
+    def _load_state(self, conn, keyword, ids):
+        """
+        Stored state of the given products (primary key lookups only).
+        """
+        conn.execute("DELETE FROM update_ids")
+        conn.executemany("INSERT OR IGNORE INTO update_ids VALUES (?)", ((int(i),) for i in ids))
+        rows = conn.execute(
+            "SELECT p.productId, p.observations, p.low, p.high, p.last_taken_at, p.prices "
+            "FROM update_ids u JOIN price_index p ON p.keyword = ? AND p.productId = u.productId",
+            (keyword,),
+        ).fetchall()
+        return pd.DataFrame(rows, columns=["productId", "observations", "low", "high",
+                                           "last_taken_at", "prices"])
+
+    def _windows(self, blobs):
+        """
+        Stored price blobs as a (len(blobs) x window) array, oldest price first.
+        Blobs written with another window size are padded/trimmed on the left.
+        """
+        size = self.window * 8
+        if all(len(blob) == size for blob in blobs):
+            return np.frombuffer(b"".join(blobs), dtype="float64").reshape(-1, self.window).copy()
+        windows = np.full((len(blobs), self.window), np.nan)
+        for row, blob in enumerate(blobs):
+            prices = np.frombuffer(blob, dtype="float64")[-self.window:]
+            windows[row, self.window - len(prices):] = prices
+        return windows
+
+    def update(self, keyword, df, taken_at=None):
+        """
+        Add one fetch (a shopping DataFrame) to the index and return the
+        statistics of each of its products against its past prices
+        (STAT_COLUMNS); `anomaly` is 'drop', 'spike' or ''.
+        """
+        taken_at = taken_at or datetime.datetime.now().isoformat(timespec="milliseconds")
+        now = shopping_diff.clean_snapshot(df)
+        now = now[now["lprice"].notna()] if "lprice" in now.columns else now.iloc[:0]
+        ids = now["productId"].to_numpy(dtype="int64")
+        price = now["lprice"].to_numpy(dtype="float64") if len(now) else np.empty(0)
+
+        conn = self._connect()
+        with conn:
+            state = self._load_state(conn, keyword, ids)
+            pos = pd.Index(state["productId"]).get_indexer(ids)
+            known = pos >= 0
+            # products already indexed for this (or a later) fetch are left alone
+            last_taken = state["last_taken_at"].to_numpy(dtype=object)
+            fresh = ~known | (last_taken[np.where(known, pos, 0)] < taken_at if len(state) else True)
+            now, ids, price, pos, known = now[fresh], ids[fresh], price[fresh], pos[fresh], known[fresh]
+
+            windows = np.full((len(ids), self.window), np.nan)
+            if known.any():
+                windows[known] = self._windows(state["prices"].to_numpy()[pos[known]])
+            stats = self._statistics(windows, price)
+
+            observations = np.zeros(len(ids), dtype="int64")
+            low = np.full(len(ids), np.nan)
+            high = np.full(len(ids), np.nan)
+            if known.any():
+                observations[known] = state["observations"].to_numpy()[pos[known]]
+                low[known] = state["low"].to_numpy(dtype="float64")[pos[known]]
+                high[known] = state["high"].to_numpy(dtype="float64")[pos[known]]
+            observations += 1
+            low, high = np.fmin(low, price), np.fmax(high, price)
+
+            windows = np.concatenate([windows[:, 1:], price[:, None]], axis=1)
+            conn.executemany(
+                "INSERT OR REPLACE INTO price_index "
+                "(keyword, productId, observations, low, high, last_taken_at, prices) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip([keyword] * len(ids), ids.tolist(), observations.tolist(),
+                    low.astype("int64").tolist(), high.astype("int64").tolist(),
+                    [taken_at] * len(ids), [row.tobytes() for row in windows]),
+            )
+
+        stats.insert(0, "productId", ids)
+        stats.insert(1, "title", shopping_diff.strip_tags(now["title"]).to_numpy()
+                     if "title" in now.columns else None)
+        stats.insert(2, "mallName", now["mallName"].to_numpy() if "mallName" in now.columns else None)
+        stats.insert(3, "lprice", price.astype("int64"))
+        stats["low"] = low.astype("int64")
+        stats["high"] = high.astype("int64")
+        stats["observations"] = observations
+        stats["anomaly"] = np.where(stats.pop("flagged"),
+                                    np.where(price < stats["prev_price"], "drop", "spike"), "")
+        return stats[STAT_COLUMNS]
+
+    def _statistics(self, windows, price):
+        """
+        Rolling statistics of `price` against the past prices in `windows`
+        (NaN = no price yet), all computed along axis 1.
+        """
+        count = np.count_nonzero(~np.isnan(windows), axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.nansum(windows, axis=1) / count
+            std = np.sqrt(np.nansum((windows - mean[:, None]) ** 2, axis=1) / count)
+            zscore = np.where((count >= self.min_points) & (std > 0), (price - mean) / std, np.nan)
+            prev_price = windows[:, -1]
+            pct_change = np.round((price - prev_price) / prev_price * 100, 1)
+        move = np.abs(np.nan_to_num(pct_change))
+        flagged = (move >= self.pct) | \
+                  ((np.abs(np.nan_to_num(zscore)) >= self.zscore) & (move >= self.min_pct))
+        return pd.DataFrame({
+            "prev_price": prev_price,
+            "pct_change": pct_change,
+            "window_mean": np.round(mean, 1),
+            "window_std": np.round(std, 1),
+            "zscore": np.round(zscore, 2),
+            "window_min": np.fmin.reduce(windows, axis=1) if windows.size else np.empty(0),
+            "window_max": np.fmax.reduce(windows, axis=1) if windows.size else np.empty(0),
+            "flagged": flagged,
+        })
+
+    def backfill(self, store, keyword):
+        """
+        Replay the snapshots of `keyword` from a SnapshotStore, oldest first.
+        Fetches already in the index are skipped.
+        """
+        snapshots = store.list_snapshots(keyword)
+        for snapshot_id, taken_at in zip(snapshots["id"][::-1], snapshots["taken_at"][::-1]):
+            self.update(keyword, store.load(int(snapshot_id)), taken_at=taken_at)
+        return len(snapshots)
+
+
+def anomalies(stats):
+    """
+    The flagged rows of update() results, largest moves first.
+    """
+    flagged = stats[stats["anomaly"] != ""]
+    strength = np.fmax(flagged["zscore"].abs().fillna(0) * 10, flagged["pct_change"].abs().fillna(0))
+    return flagged.iloc[np.argsort(-strength.to_numpy(), kind="stable")].reset_index(drop=True)
+
+
+def summarize_anomalies(flagged, limit=10):
+    """
+    Render flagged prices as compact text lines for the report and the LLM prompt.
+    """
+    if flagged.empty:
+        return "가격 이상 징후 없음"
+    lines = [f"가격 이상 징후 {len(flagged)}개:"]
+    for row in flagged.head(limit).to_dict("records"):
+        kind = "급락" if row["anomaly"] == "drop" else "급등"
+        zscore = "" if pd.isna(row["zscore"]) else f", z={row['zscore']:+}"
+        lines.append(
+            f"- [{kind}] {row['title']} ({row['mallName']}): {row['prev_price']:.0f} -> {row['lprice']}원 "
+            f"({row['pct_change']:+}%{zscore}, 최근 {min(row['observations'] - 1, PRICE_WINDOW)}회 "
+            f"범위 {row['window_min']:.0f}~{row['window_max']:.0f}원)"
+        )
+    return "\n".join(lines)
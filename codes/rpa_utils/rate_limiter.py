@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import sqlite3
+import datetime
+
+from rpa_utils.disk_cache import DEFAULT_CACHE_DIR
+
+
+class QuotaExceededError(Exception):
+    """
+    Raised when the persisted daily call quota is used up.
+    """
+
+
+class SharedRateLimiter:
+    """
+    Token bucket rate limiter with a daily quota counter.
+
+    State is kept in a SQLite file, so every process using the same `path`
+    shares one bucket and one daily counter. Callers block in acquire()
+    until a token is available instead of failing.
+    """
+
+    def __init__(self, path, rate_per_sec=10, burst=10, daily_quota=25000):
+        self.path = path
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.daily_quota = daily_quota
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS bucket (
+                    name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_usage (
+                    name TEXT NOT NULL, day TEXT NOT NULL, calls INTEGER NOT NULL,
+                    PRIMARY KEY (name, day)
+                )
+            """)
+
+    def _connect(self):
+        # isolation_level=None: transactions are managed with explicit BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _try_acquire(self, name):
+        """
+        Take one token if available. Returns 0 on success, otherwise the
+        number of seconds to wait before the next token.
+        """
+        now = time.time()
+        today = datetime.date.today().isoformat()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT calls FROM daily_usage WHERE name = ? AND day = ?", (name, today)
+            ).fetchone()
+            calls = row[0] if row else 0
+            if calls >= self.daily_quota:
+                conn.execute("ROLLBACK")
+                raise QuotaExceededError(
+                    f"Daily quota of {self.daily_quota} calls for '{name}' used up ({today})."
+                )
+
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM bucket WHERE name = ?", (name,)
+            ).fetchone()
+            tokens, updated_at = row if row else (self.burst, now)
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate_per_sec)
+            if tokens < 1:
+                conn.execute("ROLLBACK")
+                return (1 - tokens) / self.rate_per_sec
+
+            conn.execute(
+                "INSERT OR REPLACE INTO bucket VALUES (?, ?, ?)", (name, tokens - 1, now)
+            )
+            conn.execute(
+                "INSERT INTO daily_usage VALUES (?, ?, 1) "
+                "ON CONFLICT(name, day) DO UPDATE SET calls = calls + 1",
+                (name, today),
+            )
+            conn.execute("COMMIT")
+            return 0
+        finally:
+            conn.close()
+
+    def acquire(self, name="default"):
+        """
+        Block until a call is allowed for `name`.
+        """
+        while True:
+            wait = self._try_acquire(name)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def calls_today(self, name="default"):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT calls FROM daily_usage WHERE name = ? AND day = ?",
+                (name, datetime.date.today().isoformat()),
+            ).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """
+    Exponential backoff with full jitter for the given retry attempt (0-based).
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Naver search API: about 10 calls/sec and 25,000 calls/day per application
+naver_rate_limiter = SharedRateLimiter(
+    os.path.join(DEFAULT_CACHE_DIR, "naver_rate_limit.sqlite"),
+    rate_per_sec=float(os.getenv("NAVER_RATE_PER_SEC", "10")),
+    burst=int(os.getenv("NAVER_RATE_BURST", "10")),
+    daily_quota=int(os.getenv("NAVER_DAILY_QUOTA", "25000")),
+)
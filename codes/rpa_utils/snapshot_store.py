@@ -0,0 +1,148 @@
+import os
+import sqlite3
+import datetime
+import threading
+
+import pandas as pd
+
+from rpa_utils import naver_parser, shopping_diff
+
+DEFAULT_SNAPSHOT_PATH = os.getenv(
+    "RPA_SNAPSHOT_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                 ".history", "snapshots.sqlite"),
+)
+
+COLUMNS = shopping_diff.NAVER_SHOP_COLUMNS
+_INT_COLUMNS = set(naver_parser.SHOP_INT_COLUMNS)
+
+
+class SnapshotStore:
+    """
+    Append-only history of Naver shopping results in SQLite.
+
+    Every fetch is stored as one snapshot keyed by (keyword, taken_at), with
+    one row per item. Items are indexed on productId and snapshots on
+    (keyword, taken_at), so any two runs can be compared and a product's
+    price can be followed over time. The prev_list/now_list sheets are
+    rendered from the latest two snapshots.
+    """
+
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        item_columns = ",\n".join(
+            f"{c} INTEGER" if c in _INT_COLUMNS else f"{c} TEXT" for c in COLUMNS
+        )
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    keyword TEXT NOT NULL,
+                    taken_at TEXT NOT NULL,
+                    item_count INTEGER NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_snapshots_keyword_time ON snapshots(keyword, taken_at)")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS items (
+                    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id),
+                    rank INTEGER NOT NULL,
+                    {item_columns},
+                    PRIMARY KEY (snapshot_id, rank)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_items_product ON items(productId, snapshot_id)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, keyword, df, taken_at=None):
+        """
+        Store one fetch result (rows in rank order). Returns the snapshot id.
+        """
+        taken_at = taken_at or datetime.datetime.now().isoformat(timespec="milliseconds")
+        frame = df.reindex(columns=COLUMNS)
+        for column in _INT_COLUMNS:
+            frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("Int64")
+        # object columns hold plain Python ints/strs and None, which sqlite3 can bind
+        values = frame.astype(object).where(frame.notna(), None).values.tolist()
+
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO snapshots (keyword, taken_at, item_count) VALUES (?, ?, ?)",
+                (keyword, taken_at, len(values)),
+            )
+            snapshot_id = cursor.lastrowid
+            placeholders = ", ".join("?" * (len(COLUMNS) + 2))
+            conn.executemany(
+                f"INSERT INTO items (snapshot_id, rank, {', '.join(COLUMNS)}) VALUES ({placeholders})",
+                [[snapshot_id, rank] + row for rank, row in enumerate(values, start=1)],
+            )
+        return snapshot_id
+
+    def list_snapshots(self, keyword, limit=None):
+        """
+        Snapshots of `keyword`, newest first: DataFrame of id, taken_at, item_count.
+        """
+        query = ("SELECT id, taken_at, item_count FROM snapshots WHERE keyword = ? "
+                 "ORDER BY taken_at DESC, id DESC")
+        params = [keyword]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        return pd.read_sql_query(query, self._connect(), params=params)
+
+    def load(self, snapshot_id):
+        """
+        Items of one snapshot as a typed DataFrame indexed by '순위'.
+        """
+        df = pd.read_sql_query(
+            f"SELECT rank, {', '.join(COLUMNS)} FROM items WHERE snapshot_id = ? ORDER BY rank",
+            self._connect(), params=[snapshot_id],
+        )
+        df = naver_parser.apply_shop_dtypes(df.set_index("rank").rename_axis("순위"))
+        return df
+
+    def latest(self, keyword, offset=0):
+        """
+        The newest snapshot of `keyword` (offset=1: the one before, ...),
+        or None when there are not enough snapshots.
+        """
+        snapshots = self.list_snapshots(keyword, limit=offset + 1)
+        if len(snapshots) <= offset:
+            return None
+        return self.load(int(snapshots["id"].iloc[offset]))
+
+    def compare(self, keyword, base_id=None, target_id=None):
+        """
+        shopping_diff.compute_changes between two snapshots of `keyword`.
+        Defaults: the latest snapshot against the one before it.
+        """
+        snapshots = self.list_snapshots(keyword)
+        if target_id is None:
+            target_id = int(snapshots["id"].iloc[0])
+        if base_id is None:
+            base_id = int(snapshots["id"].iloc[1])
+        return shopping_diff.compute_changes(self.load(base_id), self.load(target_id))
+
+    def price_history(self, product_id, keyword=None):
+        """
+        (taken_at, keyword, rank, lprice, mallName) of one product across all snapshots.
+        """
+        query = ("SELECT s.taken_at, s.keyword, i.rank, i.lprice, i.mallName "
+                 "FROM items i JOIN snapshots s ON s.id = i.snapshot_id WHERE i.productId = ?")
+        params = [int(product_id)]
+        if keyword:
+            query += " AND s.keyword = ?"
+            params.append(keyword)
+        return pd.read_sql_query(query + " ORDER BY s.taken_at", self._connect(), params=params)
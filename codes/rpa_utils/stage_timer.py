@@ -0,0 +1,59 @@
+import math
+import time
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+_timings = defaultdict(list)
+_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """
+    Record the wall-clock duration of a pipeline stage.
+
+        with stage("shop_fetch"):
+            ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            _timings[name].append(elapsed)
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize():
+    """
+    Return {stage: {count, total, p50, p95, max}} for every recorded stage.
+    """
+    with _lock:
+        timings = {name: list(values) for name, values in _timings.items()}
+    return {
+        name: {
+            "count": len(values),
+            "total": sum(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": max(values),
+        }
+        for name, values in timings.items()
+    }
+
+
+def reset():
+    with _lock:
+        _timings.clear()
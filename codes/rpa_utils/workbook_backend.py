@@ -0,0 +1,291 @@
+import os
+import abc
+import contextlib
+
+import openpyxl
+from openpyxl.styles import Alignment
+
+from rpa_utils import excel_io, file_lock, naver_parser, shopping_diff
+from rpa_utils.stage_timer import stage
+
+# 'openpyxl' (headless, default) or 'xlwings' (drives a local Excel instance)
+WORKBOOK_BACKEND = os.getenv("WORKBOOK_BACKEND", "openpyxl")
+
+# Excel HorizontalAlignment constants used by the xlwings backend
+_XL_ALIGN = {"left": -4131, "center": -4108, "right": -4152}
+
+
+class WorkbookBackend(abc.ABC):
+    """
+    The workbook operations the RPA scripts need, independent of how the
+    file is opened:
+
+    - rotate_sheets: now_list -> prev_list, new empty now_list
+    - write_frame / read_frame: a whole sheet as a DataFrame in one bulk operation
+    - write_cell: one report cell (value, wrap, horizontal alignment)
+    - save / close
+
+    Backends implement the abstract methods; the rest is built on them.
+    Use open_workbook() to get the configured implementation, or
+    workbook_session() to apply all changes and commit them once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.discarded = False
+        self.committed = False
+
+    @abc.abstractmethod
+    def sheet_names(self):
+        """
+        Names of all sheets, in workbook order.
+        """
+
+    @abc.abstractmethod
+    def ensure_sheet(self, name, after=None):
+        """
+        Return sheet `name`, creating it after sheet `after` if it is missing.
+        """
+
+    @abc.abstractmethod
+    def delete_sheet(self, name):
+        """
+        Remove sheet `name`.
+        """
+
+    @abc.abstractmethod
+    def rename_sheet(self, old, new):
+        """
+        Rename sheet `old` to `new`.
+        """
+
+    @abc.abstractmethod
+    def write_rows(self, name, rows):
+        """
+        Replace the content of sheet `name` with `rows` (lists of values).
+        """
+
+    @abc.abstractmethod
+    def read_rows(self, name):
+        """
+        All rows of sheet `name` as lists of values.
+        """
+
+    @abc.abstractmethod
+    def write_cell(self, name, cell, value, wrap=False, align=None):
+        """
+        Write one cell (A1 notation); `align` is 'left', 'center' or 'right'.
+        """
+
+    @abc.abstractmethod
+    def save(self, path=None):
+        """
+        Write the workbook to `path` (default: the file it was opened from).
+        """
+
+    def commit(self):
+        """
+        Write all in-memory changes to the workbook file.
+        """
+        self.save()
+        self.committed = True
+
+    def discard(self):
+        """
+        Do not commit the changes made in this workbook_session().
+        """
+        self.discarded = True
+
+    def close(self):
+        pass
+
+    def rotate_sheets(self, now="now_list", prev="prev_list"):
+        """
+        Drop `prev`, rename `now` to `prev` and add an empty `now` after it.
+        Returns False when there is no `now` sheet to rotate.
+        """
+        names = self.sheet_names()
+        if prev in names:
+            self.delete_sheet(prev)
+            print(f"Sheet '{prev}' deleted.")
+        if now not in names:
+            print(f"Sheet '{now}' not found.")
+            return False
+        self.rename_sheet(now, prev)
+        print(f"Sheet '{now}' renamed to '{prev}'.")
+        self.ensure_sheet(now, after=prev)
+        print(f"Sheet '{now}' created.")
+        return True
+
+    def write_frame(self, name, dataframe, header=False):
+        self.write_rows(name, excel_io.dataframe_to_rows(dataframe, header=header))
+
+    def read_frame(self, name):
+        """
+        A prev_list/now_list sheet as a typed shopping DataFrame.
+        """
+        rows = [row for row in self.read_rows(name) if row and any(v is not None for v in row)]
+        return naver_parser.apply_shop_dtypes(shopping_diff.rows_to_dataframe(rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OpenpyxlBackend(WorkbookBackend):
+    """
+    Headless backend: the workbook is loaded into memory with openpyxl and
+    written back on save(). Runs anywhere, no Excel installation needed.
+    A missing file is created with 'now_list' and 'now_report' sheets.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        if os.path.exists(path):
+            self.wb = openpyxl.load_workbook(path)
+        else:
+            self.wb = openpyxl.Workbook()
+            self.wb.active.title = "now_list"
+            self.wb.create_sheet(title="now_report")
+
+    def sheet_names(self):
+        return self.wb.sheetnames
+
+    def ensure_sheet(self, name, after=None):
+        if name not in self.wb.sheetnames:
+            index = self.wb.sheetnames.index(after) + 1 if after in self.wb.sheetnames else None
+            self.wb.create_sheet(title=name, index=index)
+        return self.wb[name]
+
+    def delete_sheet(self, name):
+        del self.wb[name]
+
+    def rename_sheet(self, old, new):
+        self.wb[old].title = new
+
+    def write_rows(self, name, rows):
+        excel_io.replace_sheet_rows(self.ensure_sheet(name), rows)
+
+    def read_rows(self, name):
+        if name not in self.wb.sheetnames:
+            return []
+        return [list(row) for row in self.wb[name].iter_rows(values_only=True)]
+
+    def write_cell(self, name, cell, value, wrap=False, align=None):
+        target = self.ensure_sheet(name)[cell]
+        target.value = value
+        if wrap or align:
+            target.alignment = Alignment(wrap_text=wrap or None, horizontal=align)
+
+    def save(self, path=None):
+        # temp file + rename, never a half written workbook
+        excel_io.save_atomic(self.wb, path or self.path)
+
+    def close(self):
+        self.wb.close()
+
+
+class XlwingsBackend(WorkbookBackend):
+    """
+    Backend for a live Excel instance (Windows/macOS with Excel installed).
+    Every sheet read/write is a single range operation, so a frame costs one
+    COM round trip instead of one per cell. xlwings is imported lazily and
+    is not required by the headless backend.
+    """
+
+    def __init__(self, path, visible=False):
+        super().__init__(path)
+        import xlwings as xw
+        self._app = xw.App(visible=visible, add_book=False)
+        self.wb = self._app.books.open(path) if os.path.exists(path) else self._app.books.add()
+        if not os.path.exists(path):
+            self.wb.sheets[0].name = "now_list"
+            self.wb.sheets.add(name="now_report", after=self.wb.sheets[0])
+
+    def sheet_names(self):
+        return [sheet.name for sheet in self.wb.sheets]
+
+    def ensure_sheet(self, name, after=None):
+        if name not in self.sheet_names():
+            after_sheet = self.wb.sheets[after] if after in self.sheet_names() else None
+            self.wb.sheets.add(name=name, after=after_sheet)
+        return self.wb.sheets[name]
+
+    def delete_sheet(self, name):
+        self.wb.sheets[name].delete()
+
+    def rename_sheet(self, old, new):
+        self.wb.sheets[old].name = new
+
+    def write_rows(self, name, rows):
+        sheet = self.ensure_sheet(name)
+        sheet.clear_contents()
+        if rows:
+            sheet.range("A1").value = rows
+
+    def read_rows(self, name):
+        if name not in self.sheet_names():
+            return []
+        values = self.wb.sheets[name].used_range.options(ndim=2).value
+        return [list(row) for row in values or []]
+
+    def write_cell(self, name, cell, value, wrap=False, align=None):
+        target = self.ensure_sheet(name).range(cell)
+        target.value = value
+        if wrap:
+            target.api.WrapText = True
+        if align:
+            target.api.HorizontalAlignment = _XL_ALIGN[align]
+
+    def save(self, path=None):
+        self.wb.save(path or self.path)
+
+    def close(self):
+        self.wb.close()
+        self._app.quit()
+
+
+BACKENDS = {"openpyxl": OpenpyxlBackend, "xlwings": XlwingsBackend}
+
+
+def open_workbook(path, backend=None):
+    """
+    Open `path` with the given backend name (default WORKBOOK_BACKEND).
+    """
+    name = backend or WORKBOOK_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown workbook backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name](path)
+
+
+@contextlib.contextmanager
+def workbook_session(path, backend=None, lock_timeout=file_lock.WORKBOOK_LOCK_TIMEOUT):
+    """
+    Lock `path` against other runs, load it once, let the block apply every
+    change in memory and commit once when it finishes. If the block raises
+    (or calls book.discard()), nothing is written; the block may also
+    commit() itself. The lock is held from
+    load to commit, so overlapping runs cannot interleave their rotations;
+    a run that cannot get the lock within `lock_timeout` seconds raises
+    file_lock.LockTimeout.
+
+        with workbook_session(path) as book:
+            book.rotate_sheets()
+            book.write_frame("now_list", df)
+    """
+    with stage("workbook_lock"):
+        lock = file_lock.FileLock(path, timeout=lock_timeout).acquire()
+    try:
+        with stage("workbook_load"):
+            book = open_workbook(path, backend)
+        try:
+            yield book
+            if not (book.discarded or book.committed):
+                with stage("workbook_save"):
+                    book.commit()
+        finally:
+            book.close()
+    finally:
+        lock.release()